@@ -0,0 +1,217 @@
+# ruff: noqa: E501
+"""生成用于性能测试的聊天记录
+
+相同的参数与随机种子总会生成相同的数据。
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import (
+    PlatformTarget,
+    TargetDiscordChannel,
+    TargetDoDoChannel,
+    TargetDoDoPrivate,
+    TargetFeishuGroup,
+    TargetFeishuPrivate,
+    TargetKaiheilaChannel,
+    TargetKaiheilaPrivate,
+    TargetOB12Unknow,
+    TargetQQGroup,
+    TargetQQGroupOpenId,
+    TargetQQGuildChannel,
+    TargetQQGuildDirect,
+    TargetQQPrivate,
+    TargetQQPrivateOpenId,
+    TargetSatoriUnknown,
+    TargetTelegramCommon,
+    TargetTelegramForum,
+)
+from nonebot_plugin_uninfo.orm import BotModel, SceneModel, SessionModel, UserModel
+from sqlalchemy import insert
+
+from nonebot_plugin_cesaa.target import target_to_scene
+
+TargetFactory = Callable[[int], PlatformTarget]
+""" 根据序号生成 PlatformTarget 的函数 """
+
+TARGET_FACTORIES: dict[str, tuple[str, TargetFactory]] = {
+    "qq_private": ("OneBot V11", lambda i: TargetQQPrivate(user_id=10000 + i)),
+    "qq_group": ("OneBot V11", lambda i: TargetQQGroup(group_id=10000 + i)),
+    "qq_guild_direct": (
+        "OneBot V11",
+        lambda i: TargetQQGuildDirect(recipient_id=10000 + i, source_guild_id=1),
+    ),
+    "qq_guild_channel": (
+        "OneBot V11",
+        lambda i: TargetQQGuildChannel(channel_id=10000 + i),
+    ),
+    "qq_private_openid": (
+        "OneBot V11",
+        lambda i: TargetQQPrivateOpenId(user_openid=f"user{i}", bot_id="bot"),
+    ),
+    "qq_group_openid": (
+        "OneBot V11",
+        lambda i: TargetQQGroupOpenId(group_openid=f"group{i}", bot_id="bot"),
+    ),
+    "kaiheila_private": ("OneBot V11", lambda i: TargetKaiheilaPrivate(user_id=f"{i}")),
+    "kaiheila_channel": (
+        "OneBot V11",
+        lambda i: TargetKaiheilaChannel(channel_id=f"{i}"),
+    ),
+    "feishu_private": ("OneBot V11", lambda i: TargetFeishuPrivate(open_id=f"ou_{i}")),
+    "feishu_group": ("OneBot V11", lambda i: TargetFeishuGroup(chat_id=f"oc_{i}")),
+    "telegram_common": ("OneBot V11", lambda i: TargetTelegramCommon(chat_id=i)),
+    "telegram_forum": (
+        "OneBot V11",
+        lambda i: TargetTelegramForum(chat_id=1, message_thread_id=i),
+    ),
+    "dodo_private": (
+        "OneBot V11",
+        lambda i: TargetDoDoPrivate(island_source_id="1", dodo_source_id=f"{i}"),
+    ),
+    "dodo_channel": ("OneBot V11", lambda i: TargetDoDoChannel(channel_id=f"{i}")),
+    "discord_channel": ("OneBot V11", lambda i: TargetDiscordChannel(channel_id=i)),
+    "ob12_group": (
+        "OneBot V12",
+        lambda i: TargetOB12Unknow(
+            platform="benchmark", detail_type="group", group_id=f"{i}"
+        ),
+    ),
+    "satori_channel": (
+        "OneBot V11",
+        lambda i: TargetSatoriUnknown(
+            platform="benchmark", guild_id="1", channel_id=f"{i}"
+        ),
+    ),
+}
+""" 每种 PlatformTarget 的 (适配器, 生成函数) """
+
+_WORDS = ["今天", "天气", "不错", "hello", "world", "吃饭", "了吗", "nonebot", "测试"]
+
+
+async def generate(
+    rows: int,
+    *,
+    scenes: int = 10,
+    users: int = 20,
+    seed: int = 0,
+    batch_size: int = 10000,
+) -> dict[str, list[PlatformTarget]]:
+    """向数据库写入测试数据
+
+    参数:
+      * ``rows: int``: 消息记录总数
+      * ``scenes: int``: 每种 PlatformTarget 的事件场景数
+      * ``users: int``: 每个事件场景的用户数
+      * ``seed: int``: 随机种子
+      * ``batch_size: int``: 每批写入的消息记录数
+
+    返回值:
+      * ``Dict[str, List[PlatformTarget]]``: 每种 PlatformTarget 生成的发送目标，按消息数量从多到少排列
+    """
+    rng = random.Random(seed)
+    targets = {
+        name: [factory(i) for i in range(1, scenes + 1)]
+        for name, (_, factory) in TARGET_FACTORIES.items()
+    }
+
+    session_ids: list[int] = []
+    async with get_session() as db_session:
+        # 同一平台的事件场景共用一个 bot 与同一批用户
+        bots: dict[tuple[str, str], tuple[int, list[int]]] = {}
+        for name, (adapter, _) in TARGET_FACTORIES.items():
+            for target in targets[name]:
+                scope, scene_id, scene_type = target_to_scene(target)
+                assert scope is not None
+                assert scene_id is not None
+                assert scene_type is not None
+                if (bot := bots.get((adapter, scope))) is None:
+                    bot_persist_id = (
+                        await db_session.scalars(
+                            insert(BotModel).returning(BotModel.id),
+                            [{"self_id": scope, "adapter": adapter, "scope": scope}],
+                        )
+                    ).one()
+                    user_persist_ids = (
+                        await db_session.scalars(
+                            insert(UserModel).returning(UserModel.id),
+                            [
+                                {
+                                    "bot_persist_id": bot_persist_id,
+                                    "user_id": f"{user}",
+                                    "user_data": {},
+                                }
+                                for user in range(users)
+                            ],
+                        )
+                    ).all()
+                    bot = bots[(adapter, scope)] = (
+                        bot_persist_id,
+                        list(user_persist_ids),
+                    )
+                bot_persist_id, user_persist_ids = bot
+                scene_persist_id = (
+                    await db_session.scalars(
+                        insert(SceneModel).returning(SceneModel.id),
+                        [
+                            {
+                                "bot_persist_id": bot_persist_id,
+                                "parent_scene_persist_id": None,
+                                "scene_id": scene_id,
+                                "scene_type": scene_type,
+                                "scene_data": {},
+                            }
+                        ],
+                    )
+                ).one()
+                session_ids.extend(
+                    (
+                        await db_session.scalars(
+                            insert(SessionModel).returning(SessionModel.id),
+                            [
+                                {
+                                    "bot_persist_id": bot_persist_id,
+                                    "scene_persist_id": scene_persist_id,
+                                    "user_persist_id": user_persist_id,
+                                    "member_data": None,
+                                }
+                                for user_persist_id in user_persist_ids
+                            ],
+                        )
+                    ).all()
+                )
+        await db_session.commit()
+
+    # 各个事件场景的活跃程度差异很大，靠前的事件场景消息更多
+    weights = [
+        1 / (i % scenes + 1)
+        for i in range(len(session_ids) // users)
+        for _ in range(users)
+    ]
+    time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    written = 0
+    while written < rows:
+        size = min(batch_size, rows - written)
+        batch = []
+        for session_persist_id in rng.choices(session_ids, weights, k=size):
+            time += timedelta(milliseconds=rng.randint(1, 5000))
+            text = " ".join(rng.choices(_WORDS, k=rng.randint(1, 20)))
+            batch.append(
+                {
+                    "session_persist_id": session_persist_id,
+                    "time": time,
+                    "type": "message_sent" if rng.random() < 0.1 else "message",
+                    "message_id": f"{written + len(batch)}",
+                    "message": [{"type": "text", "data": {"text": text}}],
+                    "plain_text": text,
+                }
+            )
+        async with get_session() as db_session:
+            await db_session.execute(insert(MessageRecord), batch)
+            await db_session.commit()
+        written += size
+    return targets
@@ -1,12 +1,58 @@
 from nonebot import require
 from nonebot.plugin import PluginMetadata, inherit_supported_adapters
 
+require("nonebot_plugin_orm")
 require("nonebot_plugin_chatrecorder")
 require("nonebot_plugin_saa")
 
+from .aggregate import count_messages as count_messages
+from .aggregate import count_messages_by_user as count_messages_by_user
+from .aggregate import message_histogram as message_histogram
+from .config import Config
+from .export import export_messages as export_messages
+from .indexes import IndexReport as IndexReport
+from .indexes import check_indexes as check_indexes
+from .instrument import QueryMetrics as QueryMetrics
+from .instrument import on_query as on_query
+from .message import LazyMessage as LazyMessage
+from .parallel import get_message_records_parallel as get_message_records_parallel
+from .parallel import (
+    stream_message_records_parallel as stream_message_records_parallel,
+)
+from .record import explain as explain
+from .record import get_lazy_messages as get_lazy_messages
 from .record import get_message_records as get_message_records
+from .record import (
+    get_message_records_for_targets as get_message_records_for_targets,
+)
+from .record import get_message_records_page as get_message_records_page
+from .record import get_message_rows as get_message_rows
 from .record import get_messages as get_messages
+from .record import get_messages_for_targets as get_messages_for_targets
+from .record import get_messages_page as get_messages_page
 from .record import get_messages_plain_text as get_messages_plain_text
+from .record import (
+    get_messages_plain_text_for_targets as get_messages_plain_text_for_targets,
+)
+from .record import (
+    get_messages_plain_text_page as get_messages_plain_text_page,
+)
+from .record import stream_message_records as stream_message_records
+from .record import stream_messages as stream_messages
+from .record import stream_messages_plain_text as stream_messages_plain_text
+from .rollup import DailyMessageCount as DailyMessageCount
+from .rollup import backfill_rollup as backfill_rollup
+from .rollup import get_daily_message_counts as get_daily_message_counts
+from .sample import sample_message_records as sample_message_records
+from .sample import sample_messages as sample_messages
+from .sample import sample_messages_plain_text as sample_messages_plain_text
+from .search import build_search_index as build_search_index
+from .search import search_messages as search_messages
+from .target import SessionScene as SessionScene
+from .target import records_to_targets as records_to_targets
+from .target import register_target as register_target
+from .target import scene_to_target as scene_to_target
+from .watermark import get_new_messages as get_new_messages
 
 __plugin_meta__ = PluginMetadata(
     name="聊天记录扩展",
@@ -14,6 +60,7 @@ __plugin_meta__ = PluginMetadata(
     usage="请参考文档",
     type="library",
     homepage="https://github.com/he0119/nonebot-plugin-chatrecorder-extension-send-anything-anywhere",
+    config=Config,
     supported_adapters=inherit_supported_adapters(
         "nonebot_plugin_chatrecorder", "nonebot_plugin_saa"
     ),
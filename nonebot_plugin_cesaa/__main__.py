@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import click
+from nonebot_plugin_saa import PlatformTarget
+
+from .export import export_messages
+from .indexes import check_indexes
+from .rollup import backfill_rollup
+from .search import build_search_index
+
+
+@click.group()
+def cesaa() -> None:
+    """聊天记录扩展"""
+
+
+@cesaa.command("search-index")
+def search_index() -> None:
+    """创建全文索引，并为已有的消息记录建立索引"""
+    if asyncio.run(build_search_index()):
+        click.echo("全文索引已创建")
+    else:
+        click.echo("当前数据库不需要创建全文索引，PostgreSQL 请执行 nb orm upgrade")
+
+
+@cesaa.command("check-indexes")
+def check_indexes_command() -> None:
+    """检查按发送目标查询所需的索引，并显示缺少索引时的执行计划"""
+    missing = False
+    for report in asyncio.run(check_indexes()):
+        columns = ", ".join(report.columns)
+        if report.exists:
+            click.echo(f"[OK] {report.name} ({report.table}: {columns})")
+            continue
+        missing = True
+        impact = "需要扫描整张表" if report.full_scan else "未发现全表扫描"
+        click.echo(f"[缺失] {report.name} ({report.table}: {columns})，{impact}")
+        for line in report.plan:
+            click.echo(f"    {line}")
+    if missing:
+        click.echo("执行 nb orm upgrade 创建缺失的索引")
+
+
+@cesaa.command("export")
+@click.argument(
+    "directory", type=click.Path(file_okay=False, path_type=Path), required=True
+)
+@click.option("--target", default=None, help="JSON 格式的发送目标，不传入时导出全部")
+@click.option(
+    "--compression",
+    type=click.Choice(["gzip", "zstd"]),
+    default="gzip",
+    show_default=True,
+    help="压缩格式",
+)
+@click.option(
+    "--chunk-size",
+    default=64,
+    show_default=True,
+    help="单个文件压缩前的最大大小（MiB）",
+)
+def export(
+    directory: Path, target: Optional[str], compression: str, chunk_size: int
+) -> None:
+    """将消息记录导出为压缩的 JSONL 文件，中断后再次执行会继续导出"""
+    manifest = asyncio.run(
+        export_messages(
+            directory,
+            target=PlatformTarget.deserialize(target) if target else None,
+            compression=compression,  # type: ignore
+            chunk_size=chunk_size * 1024 * 1024,
+        )
+    )
+    click.echo(f"已导出 {manifest['records']} 条消息记录至 {directory}")
+
+
+@cesaa.command("rollup-backfill")
+@click.option(
+    "--start", type=click.DateTime(["%Y-%m-%d"]), default=None, help="起始日期（UTC）"
+)
+@click.option(
+    "--stop",
+    type=click.DateTime(["%Y-%m-%d"]),
+    default=None,
+    help="结束日期（UTC，包含当天）",
+)
+def rollup_backfill(start: Optional[datetime], stop: Optional[datetime]) -> None:
+    """根据已有的消息记录重新计算每日消息统计"""
+    written = asyncio.run(
+        backfill_rollup(
+            day_start=start.date() if start else None,
+            day_stop=stop.date() if stop else None,
+        )
+    )
+    click.echo(f"已写入 {written} 条每日消息统计")
+
+
+def main(*args, **kwargs) -> None:
+    if not (args or kwargs):
+        kwargs["prog_name"] = "nb cesaa"
+
+    cesaa(*args, **kwargs)
+
+
+if __name__ == "__main__":
+    main()
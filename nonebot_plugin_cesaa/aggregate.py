@@ -0,0 +1,93 @@
+# ruff: noqa: E501
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Literal, Optional, Union
+
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import PlatformTarget
+from nonebot_plugin_uninfo.orm import UserModel
+from sqlalchemy import func, select
+
+from .statement import bucket_expression, build_statement
+
+
+async def count_messages(*, target: Optional[PlatformTarget] = None, **kwargs) -> int:
+    """统计消息数量
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``int``: 消息数量
+    """
+    statement = await build_statement(
+        select(func.count(MessageRecord.id)), target, **kwargs
+    )
+    async with get_session() as db_session:
+        return (await db_session.scalar(statement)) or 0
+
+
+async def count_messages_by_user(
+    *, target: Optional[PlatformTarget] = None, limit: Optional[int] = None, **kwargs
+) -> Sequence[tuple[str, int]]:
+    """按用户统计消息数量
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``limit: Optional[int]``: 最多返回的用户数，为空表示不限制
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``List[Tuple[str, int]]``: (用户 id, 消息数量) 列表，按消息数量从多到少排序
+    """
+    count = func.count(MessageRecord.id).label("count")
+    statement = await build_statement(
+        select(UserModel.user_id, count), target, **kwargs
+    )
+    statement = statement.group_by(UserModel.user_id).order_by(
+        count.desc(), UserModel.user_id
+    )
+    if limit is not None:
+        statement = statement.limit(limit)
+    async with get_session() as db_session:
+        results = (await db_session.execute(statement)).all()
+    return [(result[0], result[1]) for result in results]
+
+
+async def message_histogram(
+    *,
+    target: Optional[PlatformTarget] = None,
+    bucket: Literal["hour", "day"] = "hour",
+    **kwargs,
+) -> Sequence[tuple[datetime, int]]:
+    """按时间段统计消息数量
+
+    时间段按 UTC 时间划分，没有消息的时间段不会出现在结果中。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``bucket: Literal["hour", "day"]``: 时间段的精度
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``List[Tuple[datetime, int]]``: (时间段起始时间, 消息数量) 列表，按时间排序，时间带 UTC 时区
+    """
+    async with get_session() as db_session:
+        dialect = db_session.get_bind(MessageRecord).dialect.name
+        # 不能与消息记录的 time 列同名，否则 PostgreSQL 会按原始时间分组
+        time_bucket = bucket_expression(dialect, bucket).label("time_bucket")
+        statement = await build_statement(
+            select(time_bucket, func.count(MessageRecord.id)), target, **kwargs
+        )
+        statement = statement.group_by(time_bucket).order_by(time_bucket)
+        results = (await db_session.execute(statement)).all()
+    return [(_to_datetime(result[0]), result[1]) for result in results]
+
+
+def _to_datetime(value: Union[str, datetime]) -> datetime:
+    # SQLite 与 MySQL 返回字符串，PostgreSQL 返回不带时区的时间
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.replace(tzinfo=timezone.utc)
@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Optional, TypeVar
+
+# PlatformTarget 等 frozen 的 pydantic 模型在类型检查时不被视为 Hashable
+_K = TypeVar("_K")
+_V = TypeVar("_V")
+
+
+class LRUCache(Generic[_K, _V]):
+    """带过期时间的 LRU 缓存
+
+    参数:
+      * ``maxsize: int``: 最多缓存的条目数，超出时淘汰最久未使用的条目
+      * ``ttl: Optional[float]``: 条目的过期时间（秒），为空表示永不过期
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[_K, tuple[float, _V]] = OrderedDict()
+
+    def get(self, key: _K) -> Optional[_V]:
+        if (item := self._data.get(key)) is None:
+            return None
+        expire_at, value = item
+        if expire_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: _K, value: _V, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expire_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        self._data[key] = (expire_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: _K) -> Optional[_V]:
+        if (item := self._data.pop(key, None)) is None:
+            return None
+        return item[1]
+
+    def items(self) -> list[tuple[_K, _V]]:
+        """所有未过期的条目，不影响淘汰顺序"""
+        now = time.monotonic()
+        return [
+            (key, value)
+            for key, (expire_at, value) in self._data.items()
+            if expire_at >= now
+        ]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,40 @@
+from typing import Optional
+
+from nonebot import get_plugin_config
+from pydantic import BaseModel
+
+
+class Config(BaseModel):
+    cesaa_target_cache_size: int = 1024
+    """ 缓存的 PlatformTarget 解析结果数量上限 """
+    cesaa_target_cache_ttl: float = 300
+    """ PlatformTarget 解析结果的缓存时间（秒） """
+    cesaa_message_cache_size: int = 1024
+    """ 缓存的反序列化消息数量上限，内容相同的消息只会反序列化一次 """
+    cesaa_deserialize_chunk_size: int = 1000
+    """ 每批反序列化的消息数量，超过该数量的查询结果会分批反序列化 """
+    cesaa_deserialize_workers: int = 0
+    """ 反序列化消息的线程数，为 0 时在事件循环中分批处理并在批次间让出事件循环 """
+    cesaa_recent_cache: bool = False
+    """ 是否在内存中保留各个事件场景最近的消息记录 """
+    cesaa_recent_cache_depth: int = 100
+    """ 每个事件场景保留的最近消息记录数量 """
+    cesaa_recent_cache_max_records: int = 100000
+    """ 内存中保留的消息记录总数上限，超出时淘汰最久未活跃的事件场景 """
+    cesaa_result_cache: bool = False
+    """ 是否缓存查询结果 """
+    cesaa_result_cache_size: int = 256
+    """ 缓存的查询结果数量上限 """
+    cesaa_result_cache_ttl: float = 60
+    """ 查询结果的缓存时间（秒），结束时间早于当前时间的查询不受此限制 """
+    cesaa_parallel_partition_rows: int = 100000
+    """ 并发查询未指定分区数时，每个时间窗口的消息数量 """
+    cesaa_parallel_max_partitions: int = 8
+    """ 并发查询自动计算的分区数与同时进行的查询数量上限 """
+    cesaa_rollup: bool = False
+    """ 是否在写入消息记录时更新每日消息统计 """
+    cesaa_slow_query_threshold: Optional[float] = None
+    """ 查询耗时超过该值（秒）时记录日志，为空表示不记录 """
+
+
+plugin_config = get_plugin_config(Config)
@@ -0,0 +1,201 @@
+# ruff: noqa: E501
+import asyncio
+import gzip
+import json
+import os
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from io import BufferedIOBase
+from pathlib import Path
+from typing import Any, Literal, Optional, Union
+
+from nonebot.compat import model_dump
+from nonebot_plugin_chatrecorder.utils import remove_timezone
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import PlatformTarget
+from sqlalchemy import select
+
+from .fields import MESSAGE_COLUMNS
+from .statement import build_statement, encode_cursor, paginate_statement
+
+Compression = Literal["gzip", "zstd"]
+
+MANIFEST_NAME = "manifest.json"
+""" 导出目录中清单文件的名称 """
+
+_EXPORT_FIELDS = [name for name in MESSAGE_COLUMNS if name != "session_persist_id"]
+_SUFFIXES: dict[Compression, str] = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def _open_compressed(path: Path, compression: Compression) -> BufferedIOBase:
+    if compression == "gzip":
+        return gzip.open(path, "wb")
+    try:
+        from compression import zstd  # type: ignore
+    except ImportError:
+        try:
+            import zstandard as zstd  # type: ignore
+        except ImportError:
+            raise ValueError("使用 zstd 压缩需要安装 zstandard") from None
+    return zstd.open(path, "wb")
+
+
+def _encode_time(time: datetime) -> str:
+    # chatrecorder 以 UTC 时间保存不带时区的消息时间
+    return time.replace(tzinfo=timezone.utc).isoformat()
+
+
+def _dump_manifest(directory: Path, manifest: dict[str, Any]) -> None:
+    """原子地写入清单，中断时不会留下不完整的清单"""
+    path = directory / MANIFEST_NAME
+    temp = path.with_name(f"{MANIFEST_NAME}.tmp")
+    temp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), "utf-8")
+    os.replace(temp, path)
+
+
+class _ChunkWriter:
+    """将消息记录写入大小受限的压缩文件
+
+    文件写完后才会重命名为正式的文件名并更新清单中的检查点，
+    因此检查点之前的消息记录一定已经完整写入。
+    """
+
+    def __init__(
+        self, directory: Path, manifest: dict[str, Any], chunk_size: int
+    ) -> None:
+        self.directory = directory
+        self.manifest = manifest
+        self.chunk_size = chunk_size
+        self._file: Optional[BufferedIOBase] = None
+        self._path: Optional[Path] = None
+        self._size = 0
+        self._records = 0
+        self._first: Optional[list[Any]] = None
+        self._last: Optional[list[Any]] = None
+
+    def _open(self) -> BufferedIOBase:
+        compression = self.manifest["compression"]
+        name = f"messages-{len(self.manifest['chunks']):06d}{_SUFFIXES[compression]}"
+        self._path = self.directory / name
+        self._size = 0
+        self._records = 0
+        self._first = None
+        return _open_compressed(self._path.with_name(f"{name}.part"), compression)
+
+    def write(self, rows: Sequence[Any]) -> bool:
+        """写入一批消息记录，返回是否有文件写完"""
+        finished = False
+        for row in rows:
+            if self._file is None:
+                self._file = self._open()
+            data = dict(zip(_EXPORT_FIELDS, row))
+            data["time"] = _encode_time(data["time"])
+            line = (json.dumps(data, ensure_ascii=False) + "\n").encode()
+            self._file.write(line)
+            self._size += len(line)
+            self._records += 1
+            self._last = [data["time"], data["id"]]
+            if self._first is None:
+                self._first = self._last
+            if self._size >= self.chunk_size:
+                self.close()
+                finished = True
+        return finished
+
+    def close(self) -> None:
+        """写完当前文件并更新清单"""
+        if self._file is None or self._path is None:
+            return
+        self._file.close()
+        self._file = None
+        part = self._path.with_name(f"{self._path.name}.part")
+        os.replace(part, self._path)
+        self.manifest["chunks"].append(
+            {
+                "file": self._path.name,
+                "records": self._records,
+                "bytes": self._path.stat().st_size,
+                "first": self._first,
+                "last": self._last,
+            }
+        )
+        self.manifest["records"] += self._records
+        self.manifest["checkpoint"] = self._last
+
+
+async def export_messages(
+    directory: Union[str, Path],
+    *,
+    target: Optional[PlatformTarget] = None,
+    compression: Compression = "gzip",
+    chunk_size: int = 64 * 1024 * 1024,
+    yield_per: int = 1000,
+    **kwargs,
+) -> dict[str, Any]:
+    """将消息记录流式导出为压缩的 JSONL 文件
+
+    消息记录按 (消息时间, 消息记录 id) 升序写入 `messages-000000.jsonl.gz` 等文件，每行一条消息记录。
+    导出目录中的 `manifest.json` 记录了导出参数、各个文件的信息与最后导出的 (消息时间, 消息记录 id)。
+    每写完一个文件就会更新清单，导出中断后使用相同的参数再次调用会从上次的位置继续。
+
+    参数:
+      * ``directory: Union[str, Path]``: 导出目录，不存在时会自动创建
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``compression: Literal["gzip", "zstd"]``: 压缩格式，使用 zstd 需要安装 zstandard（Python 3.14 及以上版本不需要）
+      * ``chunk_size: int``: 单个文件压缩前的最大字节数，超过后会写入新的文件
+      * ``yield_per: int``: 每批从数据库读取的记录数
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``Dict[str, Any]``: 导出完成后的清单
+    """
+    if compression not in _SUFFIXES:
+        raise ValueError(f"不支持的压缩格式：{compression}")
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    params = {
+        "target": model_dump(target) if target else None,
+        "filters": json.loads(json.dumps(kwargs, default=str)),
+        "compression": compression,
+    }
+    manifest_path = directory / MANIFEST_NAME
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text("utf-8"))
+        if {key: manifest.get(key) for key in params} != params:
+            raise ValueError(f"导出目录 {directory} 中已有参数不同的导出")
+        if manifest["completed"]:
+            return manifest
+    else:
+        manifest = {
+            **params,
+            "chunks": [],
+            "records": 0,
+            "checkpoint": None,
+            "completed": False,
+        }
+        _dump_manifest(directory, manifest)
+
+    cursor = None
+    if checkpoint := manifest["checkpoint"]:
+        time, id = checkpoint
+        cursor = encode_cursor(remove_timezone(datetime.fromisoformat(time)), id)
+    statement = await build_statement(
+        select(*(MESSAGE_COLUMNS[name] for name in _EXPORT_FIELDS)), target, **kwargs
+    )
+    statement = paginate_statement(
+        statement, order="asc", cursor=cursor
+    ).execution_options(yield_per=yield_per)
+
+    writer = _ChunkWriter(directory, manifest, chunk_size)
+    async with get_session() as db_session:
+        result = await db_session.stream(statement)
+        async for rows in result.partitions():
+            # 压缩与写入文件在线程中进行，避免阻塞事件循环
+            if await asyncio.to_thread(writer.write, rows):
+                await asyncio.to_thread(_dump_manifest, directory, manifest)
+
+    await asyncio.to_thread(writer.close)
+    manifest["completed"] = True
+    await asyncio.to_thread(_dump_manifest, directory, manifest)
+    return manifest
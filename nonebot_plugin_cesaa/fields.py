@@ -0,0 +1,22 @@
+from typing import Any
+
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_uninfo.orm import BotModel, SceneModel, UserModel
+from sqlalchemy.orm import InstrumentedAttribute
+
+MESSAGE_COLUMNS: dict[str, InstrumentedAttribute[Any]] = {
+    "id": MessageRecord.id,
+    "session_persist_id": MessageRecord.session_persist_id,
+    "time": MessageRecord.time,
+    "type": MessageRecord.type,
+    "message_id": MessageRecord.message_id,
+    "message": MessageRecord.message,
+    "plain_text": MessageRecord.plain_text,
+    "self_id": BotModel.self_id,
+    "adapter": BotModel.adapter,
+    "scope": BotModel.scope,
+    "scene_id": SceneModel.scene_id,
+    "scene_type": SceneModel.scene_type,
+    "user_id": UserModel.user_id,
+}
+""" 消息记录字段名与对应的列，`get_message_rows` 与导出共用 """
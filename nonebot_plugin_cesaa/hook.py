@@ -0,0 +1,190 @@
+from typing import Any, Callable, NamedTuple, TypeVar
+
+from nonebot import logger
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_chatrecorder.utils import remove_timezone
+from nonebot_plugin_uninfo.orm import BotModel, SceneModel, SessionModel, UserModel
+from sqlalchemy import Connection, event, select
+from sqlalchemy.orm import Session
+
+from .cache import LRUCache
+from .config import plugin_config
+
+
+class PersistedRecord(NamedTuple):
+    """已写入数据库的消息记录"""
+
+    record: MessageRecord
+    """ 与数据库会话无关的消息记录副本 """
+    adapter: str
+    """ 适配器名称 """
+    scene: tuple[str, str, int]
+    """ (平台类型, 事件场景 id, 事件场景类型)，与 PlatformTarget 的转换结果一致 """
+    user_id: str
+    """ 用户 id """
+
+
+RecordHook = Callable[[list[PersistedRecord]], None]
+FlushHook = Callable[[Connection, list[PersistedRecord]], None]
+SessionHook = Callable[[], None]
+HookCondition = Callable[[], bool]
+
+_H = TypeVar("_H")
+
+_record_hooks: list[tuple[RecordHook, HookCondition]] = []
+_flush_hooks: list[tuple[tuple[FlushHook, type[Any]], HookCondition]] = []
+_session_hooks: list[SessionHook] = []
+
+_SessionInfo = tuple[str, tuple[str, str, int], str]
+_session_info_cache: LRUCache[int, _SessionInfo] = LRUCache(
+    plugin_config.cesaa_target_cache_size
+)
+
+
+def on_record_persisted(
+    enabled: HookCondition,
+) -> Callable[[RecordHook], RecordHook]:
+    """注册消息记录写入数据库后的回调
+
+    回调在事务提交后同步调用，参数为该事务中写入的所有消息记录。
+    `enabled` 返回 False 时不调用该回调，所有回调都未启用时不会收集写入的消息记录。
+    """
+
+    def decorator(func: RecordHook) -> RecordHook:
+        _record_hooks.append((func, enabled))
+        return func
+
+    return decorator
+
+
+def on_record_flushed(
+    enabled: HookCondition, model: type[Any]
+) -> Callable[[FlushHook], FlushHook]:
+    """注册消息记录写入数据库时的回调
+
+    回调在写入消息记录的数据库会话中同步调用，
+    参数为 `model` 所在数据库的连接与本次写入的消息记录，可以修改 `model` 对应的表。
+    每个回调在单独的保存点中执行，出错时只撤销该回调的修改。
+    `model` 与消息记录使用不同的数据库时，两者在数据库会话提交时分别提交。
+    `enabled` 返回 False 时不调用该回调，也不会为其创建保存点。
+    """
+
+    def decorator(func: FlushHook) -> FlushHook:
+        _flush_hooks.append(((func, model), enabled))
+        return func
+
+    return decorator
+
+
+def on_session_persisted(func: SessionHook) -> SessionHook:
+    """注册新会话写入数据库后的回调"""
+    _session_hooks.append(func)
+    return func
+
+
+def _snapshot(record: MessageRecord) -> MessageRecord:
+    # 提交后原对象的属性会过期，复制一份避免再次访问数据库
+    return MessageRecord(
+        id=record.id,
+        session_persist_id=record.session_persist_id,
+        time=remove_timezone(record.time),
+        type=record.type,
+        message_id=record.message_id,
+        message=record.message,
+        plain_text=record.plain_text,
+    )
+
+
+def _collect_records(
+    session: Session, records: list[MessageRecord]
+) -> list[PersistedRecord]:
+    missing = {
+        record.session_persist_id
+        for record in records
+        if _session_info_cache.get(record.session_persist_id) is None
+    }
+    if missing:
+        # 会话对应的场景不会改变，只需查询一次
+        statement = (
+            select(
+                SessionModel.id,
+                BotModel.adapter,
+                BotModel.scope,
+                SceneModel.scene_id,
+                SceneModel.scene_type,
+                UserModel.user_id,
+            )
+            .join(BotModel, BotModel.id == SessionModel.bot_persist_id)
+            .join(SceneModel, SceneModel.id == SessionModel.scene_persist_id)
+            .join(UserModel, UserModel.id == SessionModel.user_persist_id)
+            .where(SessionModel.id.in_(missing))
+        )
+        # 直接使用连接执行，避免在 flush 过程中触发自动 flush
+        for row in session.connection().execute(statement):
+            session_persist_id, adapter, scope, scene_id, scene_type, user_id = row
+            _session_info_cache.set(
+                session_persist_id, (adapter, (scope, scene_id, scene_type), user_id)
+            )
+
+    persisted: list[PersistedRecord] = []
+    for record in records:
+        if (info := _session_info_cache.get(record.session_persist_id)) is None:
+            continue
+        adapter, scene, user_id = info
+        persisted.append(PersistedRecord(_snapshot(record), adapter, scene, user_id))
+    return persisted
+
+
+def _run_hooks(hooks: list[Any], *args: Any) -> None:
+    for hook in hooks:
+        try:
+            hook(*args)
+        except Exception as e:
+            logger.opt(exception=e).error(f"执行回调 {hook} 时出错")
+
+
+def _enabled_hooks(hooks: list[tuple[_H, HookCondition]]) -> list[_H]:
+    return [hook for hook, enabled in hooks if enabled()]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_new_instances(session: Session, flush_context: Any) -> None:
+    if _session_hooks and any(
+        isinstance(instance, SessionModel) for instance in session.new
+    ):
+        session.info["cesaa_new_session"] = True
+    # 功能未开启时不需要查询会话信息
+    record_hooks = _enabled_hooks(_record_hooks)
+    flush_hooks = _enabled_hooks(_flush_hooks)
+    if not (record_hooks or flush_hooks) or not (
+        records := [
+            instance for instance in session.new if isinstance(instance, MessageRecord)
+        ]
+    ):
+        return
+    persisted = _collect_records(session, records)
+    if record_hooks:
+        session.info.setdefault("cesaa_new_records", []).extend(persisted)
+    if flush_hooks and persisted:
+        for hook, model in flush_hooks:
+            connection = session.connection(bind_arguments={"mapper": model})
+            try:
+                with connection.begin_nested():
+                    hook(connection, persisted)
+            except Exception as e:
+                logger.opt(exception=e).error(f"执行回调 {hook} 时出错")
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_new_instances(session: Session) -> None:
+    # 仅在提交后调用，避免其他查询在提交前读到旧数据并重新写入缓存
+    if session.info.pop("cesaa_new_session", False):
+        _run_hooks(_session_hooks)
+    if records := session.info.pop("cesaa_new_records", None):
+        _run_hooks(_enabled_hooks(_record_hooks), records)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_new_instances(session: Session) -> None:
+    session.info.pop("cesaa_new_session", None)
+    session.info.pop("cesaa_new_records", None)
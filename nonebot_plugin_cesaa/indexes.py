@@ -0,0 +1,117 @@
+from typing import Any, NamedTuple
+
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_orm import Model, get_session
+from nonebot_plugin_uninfo.orm import SceneModel, SessionModel
+from sqlalchemy import Index, Select, inspect, select
+
+from .model import (
+    message_session_time_index,
+    message_time_index,
+    scene_index,
+    session_scene_index,
+)
+from .statement import explain_statement
+
+
+class IndexReport(NamedTuple):
+    """索引检查结果"""
+
+    name: str
+    """ 索引名称 """
+    table: str
+    """ 所在的表 """
+    columns: tuple[str, ...]
+    """ 索引包含的列 """
+    exists: bool
+    """ 数据库中是否已有以这些列开头的索引 """
+    plan: list[str]
+    """ 依赖该索引的典型查询的执行计划 """
+    full_scan: bool
+    """ 执行计划中是否需要扫描整张表 """
+
+
+# 每个索引对应的典型查询，参数值不影响执行计划
+_INDEX_QUERIES: list[tuple[Index, type[Model], Select[Any]]] = [
+    (
+        message_session_time_index,
+        MessageRecord,
+        select(MessageRecord.id)
+        .where(MessageRecord.session_persist_id.in_([0, 1]))
+        .order_by(MessageRecord.time)
+        .limit(10),
+    ),
+    (
+        message_time_index,
+        MessageRecord,
+        select(MessageRecord.id)
+        .order_by(MessageRecord.time, MessageRecord.id)
+        .limit(10),
+    ),
+    (
+        scene_index,
+        SceneModel,
+        select(SceneModel.id).where(
+            SceneModel.scene_id == "", SceneModel.scene_type == 0
+        ),
+    ),
+    (
+        session_scene_index,
+        SessionModel,
+        select(SessionModel.id).where(SessionModel.scene_persist_id == 0),
+    ),
+]
+
+
+def _is_full_scan(dialect: str, table: str, plan: list[str]) -> bool:
+    for line in plan:
+        if dialect == "sqlite":
+            # SQLite 中使用索引时为 SEARCH 或 SCAN ... USING INDEX
+            if line.startswith(f"SCAN {table}") and "USING" not in line:
+                return True
+        elif dialect == "postgresql":
+            if f"Seq Scan on {table}" in line:
+                return True
+        elif f" {table} " in line and " ALL " in line:
+            # MySQL 的 type 列为 ALL 时表示全表扫描
+            return True
+    return False
+
+
+async def check_indexes() -> list[IndexReport]:
+    """检查按 PlatformTarget 查询所需的索引是否存在
+
+    对每个索引执行依赖它的典型查询的 EXPLAIN，可以据此判断缺少索引时是否需要扫描整张表。
+    PostgreSQL 与 MySQL 的执行计划中还包含估计的代价与行数。
+
+    返回值:
+      * ``List[IndexReport]``: 每个索引的检查结果
+    """
+    reports: list[IndexReport] = []
+    async with get_session() as db_session:
+        for index, model, statement in _INDEX_QUERIES:
+            table = model.__table__.name
+            columns = tuple(column.name for column in index.columns)
+            connection = await db_session.connection(bind_arguments={"mapper": model})
+            existing = await connection.run_sync(
+                lambda conn, table=table: [
+                    *inspect(conn).get_indexes(table),
+                    *inspect(conn).get_unique_constraints(table),
+                ]
+            )
+            exists = any(
+                tuple(item["column_names"][: len(columns)]) == columns
+                for item in existing
+            )
+            plan = await explain_statement(db_session, statement, model)
+            reports.append(
+                IndexReport(
+                    name=str(index.name),
+                    table=table,
+                    columns=columns,
+                    exists=exists,
+                    plan=plan,
+                    full_scan=_is_full_scan(connection.dialect.name, table, plan),
+                )
+            )
+    return reports
@@ -0,0 +1,180 @@
+import json
+import time
+from collections.abc import Iterable, Sequence
+from typing import TYPE_CHECKING, Any, Callable, Literal, Optional
+
+from nonebot import logger
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import PlatformTarget
+from sqlalchemy import ClauseElement, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import plugin_config
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Dialect
+
+
+class QueryMetrics:
+    """一次查询的统计信息"""
+
+    __slots__ = (
+        "api",
+        "deserialize_time",
+        "fetch_time",
+        "kwargs",
+        "payload_bytes",
+        "rows",
+        "sql",
+        "sql_time",
+        "target_type",
+    )
+
+    api: str
+    """ 调用的函数名 """
+    target_type: Optional[str]
+    """ PlatformTarget 类型名，未传入时为 None """
+    kwargs: dict[str, Any]
+    """ 筛选与分页参数 """
+    sql: str
+    """ 执行的 SQL 语句 """
+    sql_time: float
+    """ 执行 SQL 语句的耗时（秒），包含数据库驱动读取结果的时间 """
+    fetch_time: float
+    """ 将结果转换为行或 ORM 对象的耗时（秒） """
+    deserialize_time: float
+    """ 反序列化消息的耗时（秒） """
+    rows: int
+    """ 返回的行数 """
+    payload_bytes: int
+    """ 消息内容序列化后的字节数 """
+
+    def __init__(
+        self, api: str, target_type: Optional[str], kwargs: dict[str, Any]
+    ) -> None:
+        self.api = api
+        self.target_type = target_type
+        self.kwargs = kwargs
+        self.sql = ""
+        self.sql_time = 0.0
+        self.fetch_time = 0.0
+        self.deserialize_time = 0.0
+        self.rows = 0
+        self.payload_bytes = 0
+
+    @property
+    def total_time(self) -> float:
+        return self.sql_time + self.fetch_time + self.deserialize_time
+
+    def __repr__(self) -> str:
+        return (
+            f"QueryMetrics(api={self.api!r}, target_type={self.target_type!r}, "
+            f"rows={self.rows}, total_time={self.total_time:.6f})"
+        )
+
+
+QueryCallback = Callable[[QueryMetrics], None]
+
+_query_callbacks: list[QueryCallback] = []
+
+
+def on_query(func: QueryCallback) -> QueryCallback:
+    """注册查询完成后的回调，参数为该次查询的统计信息"""
+    _query_callbacks.append(func)
+    return func
+
+
+def _payload_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value.encode())
+    return len(json.dumps(value, ensure_ascii=False).encode())
+
+
+class QueryTimer:
+    """记录一次查询各个阶段的耗时
+
+    没有注册回调且未设置慢查询阈值时不做任何统计。
+    """
+
+    def __init__(
+        self,
+        api: str,
+        target: Optional[PlatformTarget],
+        kwargs: dict[str, Any],
+        **pagination: Any,
+    ) -> None:
+        self.metrics: Optional[QueryMetrics] = None
+        if _query_callbacks or plugin_config.cesaa_slow_query_threshold is not None:
+            kwargs = {
+                **kwargs,
+                **{
+                    key: value for key, value in pagination.items() if value is not None
+                },
+            }
+            self.metrics = QueryMetrics(
+                api, type(target).__name__ if target else None, kwargs
+            )
+        self._statement: Optional[ClauseElement] = None
+        self._dialect: Optional[Dialect] = None
+        self._last = time.perf_counter()
+
+    def start(self, statement: ClauseElement, db_session: AsyncSession) -> None:
+        """开始执行查询语句"""
+        if self.metrics is None:
+            return
+        self._statement = statement
+        self._dialect = db_session.get_bind(MessageRecord).dialect
+        self._last = time.perf_counter()
+
+    def lap(self, stage: Literal["sql_time", "fetch_time", "deserialize_time"]) -> None:
+        """记录从上一阶段结束到现在的耗时"""
+        if self.metrics is None:
+            return
+        now = time.perf_counter()
+        setattr(self.metrics, stage, getattr(self.metrics, stage) + now - self._last)
+        self._last = now
+
+    def finish(self, rows: int, payloads: Iterable[Any] = ()) -> None:
+        """结束统计，调用回调并记录慢查询
+
+        参数:
+          * ``rows: int``: 返回的行数
+          * ``payloads: Iterable[Any]``: 消息内容，仅在需要统计时才会遍历
+        """
+        if (metrics := self.metrics) is None:
+            return
+        metrics.rows = rows
+        threshold = plugin_config.cesaa_slow_query_threshold
+        slow = threshold is not None and metrics.total_time >= threshold
+        if not (slow or _query_callbacks):
+            return
+        # 只有回调需要消息内容的字节数，慢查询日志不需要
+        if _query_callbacks:
+            metrics.payload_bytes = sum(_payload_size(payload) for payload in payloads)
+        if self._statement is not None:
+            metrics.sql = str(self._statement.compile(dialect=self._dialect))
+
+        if slow:
+            logger.warning(
+                f"慢查询 {metrics.api} 用时 {metrics.total_time:.3f}s，"
+                f"返回 {metrics.rows} 行：{metrics.sql}"
+            )
+        for callback in _query_callbacks:
+            try:
+                callback(metrics)
+            except Exception as e:
+                logger.opt(exception=e).error(f"执行查询回调 {callback} 时出错")
+
+
+async def execute_statement(
+    timer: QueryTimer, statement: Select[Any], *, scalars: bool = False
+) -> Sequence[Any]:
+    """执行查询语句并记录耗时"""
+    async with get_session() as db_session:
+        timer.start(statement, db_session)
+        result = await db_session.execute(statement)
+        timer.lap("sql_time")
+        rows = result.scalars().all() if scalars else result.all()
+        timer.lap("fetch_time")
+    return rows
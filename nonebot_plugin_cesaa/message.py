@@ -0,0 +1,143 @@
+import asyncio
+import json
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from nonebot.adapters import Message, MessageSegment
+from nonebot_plugin_chatrecorder import deserialize_message
+from nonebot_plugin_chatrecorder.message import JsonMsg
+
+from .cache import LRUCache
+from .config import plugin_config
+
+_message_cache: LRUCache[tuple[str, str], Message] = LRUCache(
+    plugin_config.cesaa_message_cache_size
+)
+
+
+def deserialize_message_cached(adapter: str, msg: JsonMsg) -> Message:
+    """反序列化消息，内容相同的消息只会反序列化一次
+
+    相同内容的消息会返回同一个 `Message` 对象，请勿原地修改。
+    """
+    key = (adapter, json.dumps(msg, sort_keys=True, ensure_ascii=False))
+    if (message := _message_cache.get(key)) is None:
+        message = deserialize_message(adapter, msg)
+        _message_cache.set(key, message)
+    return message
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            plugin_config.cesaa_deserialize_workers, thread_name_prefix="cesaa"
+        )
+    return _executor
+
+
+def _deserialize_chunk(items: Sequence[tuple[str, JsonMsg]]) -> list[Message]:
+    return [deserialize_message(adapter, msg) for adapter, msg in items]
+
+
+async def deserialize_messages(items: Sequence[tuple[str, JsonMsg]]) -> list[Message]:
+    """批量反序列化消息
+
+    数量较多时分批处理：设置了线程数时交给线程池，否则在每批之间让出事件循环，避免长时间阻塞其他事件的处理。
+
+    参数:
+      * ``items: Sequence[Tuple[str, JsonMsg]]``: (适配器名称, 序列化后的消息) 列表
+    """
+    chunk_size = plugin_config.cesaa_deserialize_chunk_size
+    if len(items) <= chunk_size:
+        return _deserialize_chunk(items)
+
+    chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+    if plugin_config.cesaa_deserialize_workers > 0:
+        loop = asyncio.get_running_loop()
+        executor = _get_executor()
+        results = await asyncio.gather(
+            *[loop.run_in_executor(executor, _deserialize_chunk, c) for c in chunks]
+        )
+    else:
+        results = []
+        for chunk in chunks:
+            results.append(_deserialize_chunk(chunk))
+            await asyncio.sleep(0)
+    return [message for result in results for message in result]
+
+
+_MUTATING_METHODS = frozenset(
+    {"append", "extend", "insert", "pop", "remove", "clear", "reverse", "sort"}
+)
+
+
+class LazyMessage:
+    """延迟反序列化的消息
+
+    保存原始的序列化消息与适配器名称，在首次访问消息内容时才会反序列化。
+    可以像 `Message` 一样迭代、索引、拼接、比较和访问属性。
+
+    内容相同的消息共享同一个反序列化结果，`message` 属性是只读的，请勿原地修改。
+    通过 `append` 等方法修改时会先复制一份，只影响当前对象，`raw` 不会随之改变。
+    """
+
+    __slots__ = ("_message", "_owned", "adapter", "raw")
+
+    def __init__(self, adapter: str, raw: JsonMsg) -> None:
+        self.adapter = adapter
+        """ 适配器名称 """
+        self.raw = raw
+        """ 序列化后的消息 """
+        self._message: Optional[Message] = None
+        self._owned = False
+
+    @property
+    def message(self) -> Message:
+        """反序列化后的消息"""
+        if self._message is None:
+            self._message = deserialize_message_cached(self.adapter, self.raw)
+        return self._message
+
+    def __getattr__(self, name: str) -> Any:
+        if name in LazyMessage.__slots__:
+            raise AttributeError(name)
+        if name in _MUTATING_METHODS and not self._owned:
+            self._message = self.message.copy()
+            self._owned = True
+        return getattr(self.message, name)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.message[key]
+
+    def __contains__(self, value: object) -> bool:
+        return value in self.message
+
+    def __add__(self, other: Any) -> Message:
+        return self.message + other
+
+    def __radd__(self, other: Any) -> Message:
+        return self.message.__radd__(other)
+
+    def __iter__(self) -> Iterator[MessageSegment]:
+        return iter(self.message)
+
+    def __len__(self) -> int:
+        return len(self.message)
+
+    def __str__(self) -> str:
+        return str(self.message)
+
+    def __repr__(self) -> str:
+        return f"LazyMessage(adapter={self.adapter!r}, raw={self.raw!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LazyMessage):
+            other = other.message
+        return self.message == other
+
+    __hash__ = None  # type: ignore
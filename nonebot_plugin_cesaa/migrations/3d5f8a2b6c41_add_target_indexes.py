@@ -0,0 +1,61 @@
+"""add_target_indexes
+
+迁移 ID: 3d5f8a2b6c41
+父迁移: 7b3e1c9a4f2d
+创建时间: 2026-10-18 16:30:00.000000
+
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "3d5f8a2b6c41"
+down_revision: str | Sequence[str] | None = "7b3e1c9a4f2d"
+branch_labels: str | Sequence[str] | None = None
+# 依赖创建消息记录表的 chatrecorder 迁移，该迁移又依赖创建事件场景与会话表的 uninfo 迁移
+depends_on: str | Sequence[str] | None = "bc43ce947963"
+
+
+def upgrade(name: str = "") -> None:
+    if name:
+        return
+    op.create_index(
+        "ix_cesaa_message_session_time",
+        "nonebot_plugin_chatrecorder_messagerecord_v2",
+        ["session_persist_id", "time"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_cesaa_message_time",
+        "nonebot_plugin_chatrecorder_messagerecord_v2",
+        ["time", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_cesaa_scene",
+        "nonebot_plugin_uninfo_scenemodel",
+        ["scene_id", "scene_type"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_cesaa_session_scene",
+        "nonebot_plugin_uninfo_sessionmodel",
+        ["scene_persist_id"],
+        unique=False,
+    )
+
+
+def downgrade(name: str = "") -> None:
+    if name:
+        return
+    op.drop_index("ix_cesaa_session_scene", "nonebot_plugin_uninfo_sessionmodel")
+    op.drop_index("ix_cesaa_scene", "nonebot_plugin_uninfo_scenemodel")
+    op.drop_index(
+        "ix_cesaa_message_time", "nonebot_plugin_chatrecorder_messagerecord_v2"
+    )
+    op.drop_index(
+        "ix_cesaa_message_session_time", "nonebot_plugin_chatrecorder_messagerecord_v2"
+    )
@@ -0,0 +1,49 @@
+"""add_plain_text_trgm_index
+
+迁移 ID: 5e8b2d4f1a67
+父迁移: 9c2e7f1a5b83
+创建时间: 2026-10-18 18:00:00.000000
+
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "5e8b2d4f1a67"
+down_revision: str | Sequence[str] | None = "9c2e7f1a5b83"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade(name: str = "") -> None:
+    if name:
+        return
+    # 只有 PostgreSQL 需要 pg_trgm 索引
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # 之前通过 nb cesaa search-index 创建过同名索引时跳过
+    op.create_index(
+        "ix_nonebot_plugin_cesaa_plain_text_trgm",
+        "nonebot_plugin_chatrecorder_messagerecord_v2",
+        ["plain_text"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"plain_text": "gin_trgm_ops"},
+        if_not_exists=True,
+    )
+
+
+def downgrade(name: str = "") -> None:
+    if name:
+        return
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_index(
+        "ix_nonebot_plugin_cesaa_plain_text_trgm",
+        "nonebot_plugin_chatrecorder_messagerecord_v2",
+        if_exists=True,
+    )
@@ -0,0 +1,103 @@
+from datetime import date, datetime
+from typing import Optional
+
+from alembic.autogenerate import comparators
+from alembic.autogenerate.api import AutogenContext
+from alembic.operations.ops import CreateIndexOp, DropIndexOp, ModifyTableOps
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_orm import Model
+from nonebot_plugin_uninfo.orm import SceneModel, SessionModel
+from sqlalchemy import Index, String, Table, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class ConsumerWatermark(Model):
+    """消费者已处理到的位置"""
+
+    __table_args__ = (
+        UniqueConstraint("consumer", "target", name="unique_consumer_target"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    consumer: Mapped[str] = mapped_column(String(64))
+    """ 消费者名称 """
+    target: Mapped[str] = mapped_column(String(255))
+    """ 发送目标与筛选参数的摘要，均未指定时为空字符串 """
+    time: Mapped[datetime]
+    """ 最后处理的消息时间\n\n存放 UTC 时间 """
+    record_id: Mapped[int]
+    """ 最后处理的消息记录 id """
+
+
+class MessageRollup(Model):
+    """每个用户在每个事件场景中每天的消息统计"""
+
+    __table_args__ = (
+        UniqueConstraint(
+            "scope", "scene_type", "scene_id", "day", "user_id", name="unique_rollup"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    scope: Mapped[str] = mapped_column(String(32))
+    """ 平台类型 """
+    scene_type: Mapped[int]
+    """ 事件场景类型 """
+    scene_id: Mapped[str] = mapped_column(String(64))
+    """ 事件场景 id """
+    day: Mapped[date]
+    """ 日期\n\n按 UTC 时间划分 """
+    user_id: Mapped[str] = mapped_column(String(64))
+    """ 用户 id """
+    count: Mapped[int]
+    """ 消息数量 """
+    chars: Mapped[int]
+    """ 纯文本消息的字符数之和 """
+
+
+# 按 PlatformTarget 查询时需要的索引，由本插件的迁移脚本创建
+message_session_time_index = Index(
+    "ix_cesaa_message_session_time",
+    MessageRecord.session_persist_id,
+    MessageRecord.time,
+)
+""" 按会话筛选并按时间排序消息记录 """
+message_time_index = Index(
+    "ix_cesaa_message_time", MessageRecord.time, MessageRecord.id
+)
+""" 不限定会话时按 (消息时间, 消息记录 id) 排序与分页 """
+scene_index = Index("ix_cesaa_scene", SceneModel.scene_id, SceneModel.scene_type)
+""" 根据 PlatformTarget 查找事件场景 """
+session_scene_index = Index("ix_cesaa_session_scene", SessionModel.scene_persist_id)
+""" 根据事件场景查找会话 """
+# 仅在 PostgreSQL 中存在，由本插件的迁移脚本创建
+plain_text_trgm_index = Index(
+    "ix_nonebot_plugin_cesaa_plain_text_trgm",
+    MessageRecord.plain_text,
+    postgresql_using="gin",
+    postgresql_ops={"plain_text": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+""" 基于 pg_trgm 搜索纯文本消息 """
+
+
+@comparators.dispatch_for("table")
+def _skip_plain_text_trgm_index(
+    autogen_context: AutogenContext,
+    modify_table_ops: ModifyTableOps,
+    schema: Optional[str],
+    tname: str,
+    conn_table: Optional[Table],
+    metadata_table: Optional[Table],
+) -> None:
+    """其他数据库中没有 pg_trgm 索引，比较数据库结构时忽略"""
+    dialect = autogen_context.dialect
+    if dialect is None or dialect.name == "postgresql":
+        return
+    modify_table_ops.ops = [
+        op
+        for op in modify_table_ops.ops
+        if not (
+            isinstance(op, (CreateIndexOp, DropIndexOp))
+            and op.index_name == plain_text_trgm_index.name
+        )
+    ]
@@ -0,0 +1,157 @@
+# ruff: noqa: E501
+import asyncio
+import math
+from collections import deque
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+from typing import Any, Literal, Optional
+
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_chatrecorder.utils import remove_timezone
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import PlatformTarget
+from sqlalchemy import Select, func, select
+
+from .config import plugin_config
+from .instrument import QueryTimer, execute_statement
+from .statement import build_statement, paginate_statement
+
+_Window = tuple[datetime, datetime, bool]
+""" (起始时间, 结束时间, 是否包含结束时间) """
+
+
+async def _plan_windows(
+    target: Optional[PlatformTarget],
+    partitions: Optional[int],
+    kwargs: dict[str, Any],
+) -> list[_Window]:
+    """将查询的时间范围等分为多个时间窗口
+
+    未指定分区数时，根据消息数量计算；已指定分区数与完整的时间范围时不需要额外查询。
+    """
+    if partitions is not None and partitions < 1:
+        raise ValueError("分区数必须大于 0")
+
+    time_start, time_stop = kwargs.get("time_start"), kwargs.get("time_stop")
+    if partitions is not None and time_start and time_stop:
+        start, stop = remove_timezone(time_start), remove_timezone(time_stop)
+    else:
+        statement = await build_statement(
+            select(
+                func.count(MessageRecord.id),
+                func.min(MessageRecord.time),
+                func.max(MessageRecord.time),
+            ),
+            target,
+            **kwargs,
+        )
+        async with get_session() as db_session:
+            count, start, stop = (await db_session.execute(statement)).one()
+        if not count:
+            return []
+        if partitions is None:
+            partitions = math.ceil(count / plugin_config.cesaa_parallel_partition_rows)
+            partitions = min(partitions, plugin_config.cesaa_parallel_max_partitions)
+
+    if start >= stop:
+        return [(start, stop, True)]
+    step = (stop - start) / partitions
+    boundaries = [start + step * i for i in range(partitions)] + [stop]
+    return [
+        (boundaries[i], boundaries[i + 1], i == partitions - 1)
+        for i in range(partitions)
+    ]
+
+
+def _window_statement(statement: Select[Any], window: _Window) -> Select[Any]:
+    start, stop, inclusive = window
+    return statement.where(
+        MessageRecord.time >= start,
+        MessageRecord.time <= stop if inclusive else MessageRecord.time < stop,
+    )
+
+
+async def stream_message_records_parallel(
+    *,
+    target: Optional[PlatformTarget] = None,
+    partitions: Optional[int] = None,
+    order: Literal["asc", "desc"] = "asc",
+    **kwargs,
+) -> AsyncIterator[MessageRecord]:
+    """将查询的时间范围分为多个时间窗口并发查询，按时间顺序逐条返回消息记录
+
+    每个时间窗口使用单独的数据库会话，在连接池足够大的 PostgreSQL 等数据库上可以同时利用多个核心。
+    正在查询或已查询完成但尚未返回的时间窗口不超过 `cesaa_parallel_max_partitions` 个，
+    开始返回一个时间窗口的消息记录时才会开始查询下一个时间窗口，内存占用与消费速度无关。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``partitions: Optional[int]``: 时间窗口数量，为空时根据消息数量与 `cesaa_parallel_partition_rows` 计算
+      * ``order: Literal["asc", "desc"]``: 按 (消息时间, 消息记录 id) 排序的方向
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``AsyncIterator[MessageRecord]``: 消息记录异步迭代器
+    """
+    windows = await _plan_windows(target, partitions, kwargs)
+    if order == "desc":
+        windows.reverse()
+    statement = await build_statement(select(MessageRecord), target, **kwargs)
+    statement = paginate_statement(statement, order=order)
+
+    async def fetch(window: _Window) -> Sequence[MessageRecord]:
+        timer = QueryTimer(
+            "stream_message_records_parallel", target, kwargs, order=order
+        )
+        records = await execute_statement(
+            timer, _window_statement(statement, window), scalars=True
+        )
+        timer.finish(len(records), (record.message for record in records))
+        return records
+
+    pending = iter(windows)
+    tasks: deque[asyncio.Future[Sequence[MessageRecord]]] = deque()
+
+    def schedule() -> None:
+        if (window := next(pending, None)) is not None:
+            tasks.append(asyncio.ensure_future(fetch(window)))
+
+    for _ in range(plugin_config.cesaa_parallel_max_partitions):
+        schedule()
+    try:
+        while tasks:
+            records = await tasks.popleft()
+            schedule()
+            for record in records:
+                yield record
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def get_message_records_parallel(
+    *,
+    target: Optional[PlatformTarget] = None,
+    partitions: Optional[int] = None,
+    order: Literal["asc", "desc"] = "asc",
+    **kwargs,
+) -> list[MessageRecord]:
+    """将查询的时间范围分为多个时间窗口并发查询，返回按时间排序的消息记录
+
+    适用于时间跨度较大的查询，参数与 `stream_message_records_parallel` 相同。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``partitions: Optional[int]``: 时间窗口数量，为空时根据消息数量与 `cesaa_parallel_partition_rows` 计算
+      * ``order: Literal["asc", "desc"]``: 按 (消息时间, 消息记录 id) 排序的方向
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``List[MessageRecord]``: 消息记录列表
+    """
+    return [
+        record
+        async for record in stream_message_records_parallel(
+            target=target, partitions=partitions, order=order, **kwargs
+        )
+    ]
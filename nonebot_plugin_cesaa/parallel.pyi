@@ -0,0 +1,62 @@
+from collections.abc import AsyncIterator, Iterable
+from datetime import datetime
+from typing import Literal
+
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_saa import PlatformTarget
+from nonebot_plugin_uninfo import SceneType, Session, SupportAdapter, SupportScope
+
+def stream_message_records_parallel(
+    *,
+    target: PlatformTarget | None = None,
+    partitions: int | None = None,
+    order: Literal["asc", "desc"] = "asc",
+    session: Session | None = None,
+    filter_self_id: bool = True,
+    filter_adapter: bool = True,
+    filter_scope: bool = True,
+    filter_scene: bool = True,
+    filter_user: bool = True,
+    self_ids: Iterable[str] | None = None,
+    adapters: Iterable[str | SupportAdapter] | None = None,
+    scopes: Iterable[str | SupportScope] | None = None,
+    scene_types: Iterable[int | SceneType] | None = None,
+    scene_ids: Iterable[str] | None = None,
+    user_ids: Iterable[str] | None = None,
+    exclude_self_ids: Iterable[str] | None = None,
+    exclude_adapters: Iterable[str | SupportAdapter] | None = None,
+    exclude_scopes: Iterable[str | SupportScope] | None = None,
+    exclude_scene_types: Iterable[int | SceneType] | None = None,
+    exclude_scene_ids: Iterable[str] | None = None,
+    exclude_user_ids: Iterable[str] | None = None,
+    time_start: datetime | None = None,
+    time_stop: datetime | None = None,
+    types: Iterable[Literal["message", "message_sent"]] | None = None,
+) -> AsyncIterator[MessageRecord]: ...
+async def get_message_records_parallel(
+    *,
+    target: PlatformTarget | None = None,
+    partitions: int | None = None,
+    order: Literal["asc", "desc"] = "asc",
+    session: Session | None = None,
+    filter_self_id: bool = True,
+    filter_adapter: bool = True,
+    filter_scope: bool = True,
+    filter_scene: bool = True,
+    filter_user: bool = True,
+    self_ids: Iterable[str] | None = None,
+    adapters: Iterable[str | SupportAdapter] | None = None,
+    scopes: Iterable[str | SupportScope] | None = None,
+    scene_types: Iterable[int | SceneType] | None = None,
+    scene_ids: Iterable[str] | None = None,
+    user_ids: Iterable[str] | None = None,
+    exclude_self_ids: Iterable[str] | None = None,
+    exclude_adapters: Iterable[str | SupportAdapter] | None = None,
+    exclude_scopes: Iterable[str | SupportScope] | None = None,
+    exclude_scene_types: Iterable[int | SceneType] | None = None,
+    exclude_scene_ids: Iterable[str] | None = None,
+    exclude_user_ids: Iterable[str] | None = None,
+    time_start: datetime | None = None,
+    time_stop: datetime | None = None,
+    types: Iterable[Literal["message", "message_sent"]] | None = None,
+) -> list[MessageRecord]: ...
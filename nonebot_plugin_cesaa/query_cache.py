@@ -0,0 +1,184 @@
+import asyncio
+import math
+from collections import deque
+from collections.abc import Awaitable, Hashable, Sequence
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Optional, TypeVar
+
+from nonebot_plugin_chatrecorder.utils import remove_timezone
+from nonebot_plugin_saa import PlatformTarget
+
+from .cache import LRUCache
+from .config import plugin_config
+from .hook import PersistedRecord, on_record_persisted
+from .target import TargetScene, match_scene, target_to_scene
+
+_R = TypeVar("_R", bound=Sequence[Any])
+
+_CacheEntry = tuple[TargetScene, Optional[datetime], list[Any]]
+_Invalidation = tuple[int, list[tuple[TargetScene, datetime]]]
+
+
+def _is_affected(
+    scene: TargetScene,
+    time_stop: Optional[datetime],
+    changes: list[tuple[TargetScene, datetime]],
+) -> bool:
+    # chatrecorder 的结束时间包含当前时刻
+    return any(
+        match_scene(scene, changed_scene) and (time_stop is None or time <= time_stop)
+        for changed_scene, time in changes
+    )
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return remove_timezone(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+class QueryCache:
+    """查询结果缓存
+
+    有新消息写入时，失效对应事件场景中结束时间不早于该消息的查询结果。
+
+    参数:
+      * ``maxsize: int``: 最多缓存的查询结果数量
+      * ``ttl: float``: 查询结果的缓存时间（秒），结束时间早于当前时间的查询结果不会过期
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._cache: LRUCache[Hashable, _CacheEntry] = LRUCache(maxsize, ttl)
+        self._generation = 0
+        # 最近的失效记录，用于判断查询期间写入的消息是否影响查询结果
+        self._invalidations: deque[_Invalidation] = deque(maxlen=256)
+
+    @staticmethod
+    def make_key(
+        api: str, target: Optional[PlatformTarget], kwargs: dict[str, Any]
+    ) -> Optional[Hashable]:
+        """根据函数名与参数生成缓存键，参数无法哈希时返回 None"""
+        key = (
+            api,
+            target,
+            tuple(sorted((name, _freeze(value)) for name, value in kwargs.items())),
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    @property
+    def generation(self) -> int:
+        """每次有新消息写入时增加，用于丢弃查询期间已经过时的结果"""
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[list[Any]]:
+        if (entry := self._cache.get(key)) is None:
+            return None
+        return entry[2]
+
+    def set(
+        self,
+        key: Hashable,
+        target: Optional[PlatformTarget],
+        time_stop: Optional[datetime],
+        value: list[Any],
+        generation: int,
+    ) -> None:
+        scene = target_to_scene(target) if target else (None, None, None)
+        if time_stop is not None:
+            time_stop = remove_timezone(time_stop)
+        if generation != self._generation:
+            if not self._invalidations or self._invalidations[0][0] > generation + 1:
+                # 失效记录已被淘汰，无法判断
+                return
+            if any(
+                _is_affected(scene, time_stop, changes)
+                for changed_generation, changes in self._invalidations
+                if changed_generation > generation
+            ):
+                return
+        # 结束时间已经过去的查询结果不会再变化
+        now = remove_timezone(datetime.now(timezone.utc))
+        ttl = math.inf if time_stop is not None and time_stop <= now else None
+        self._cache.set(key, (scene, time_stop, value), ttl)
+
+    def invalidate(self, records: list[PersistedRecord]) -> None:
+        changes: list[tuple[TargetScene, datetime]] = [
+            (record.scene, record.record.time) for record in records
+        ]
+        self._generation += 1
+        self._invalidations.append((self._generation, changes))
+        for key, (scene, time_stop, _) in self._cache.items():
+            if _is_affected(scene, time_stop, changes):
+                self._cache.pop(key)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._invalidations.clear()
+        self._cache.clear()
+
+
+query_cache = QueryCache(
+    plugin_config.cesaa_result_cache_size, plugin_config.cesaa_result_cache_ttl
+)
+
+
+@on_record_persisted(lambda: plugin_config.cesaa_result_cache)
+def _invalidate_query_cache(records: list[PersistedRecord]) -> None:
+    query_cache.invalidate(records)
+
+
+_inflight: dict[Hashable, "asyncio.Future[Any]"] = {}
+
+
+def cached_query(
+    func: Callable[..., Awaitable[_R]],
+) -> Callable[..., Awaitable[_R]]:
+    """缓存查询函数的结果，并合并同时进行的相同查询
+
+    启用查询结果缓存时，每次返回缓存结果的浅拷贝。
+    调用时传入 `coalesce=True`，会与正在进行的相同查询共用一次数据库查询，
+    每个调用者得到结果的浅拷贝。
+    """
+
+    @wraps(func)
+    async def wrapper(
+        *, target: Optional[PlatformTarget] = None, coalesce: bool = False, **kwargs
+    ) -> _R:
+        use_cache = plugin_config.cesaa_result_cache
+        if (
+            not (use_cache or coalesce)
+            or (key := query_cache.make_key(func.__name__, target, kwargs)) is None
+        ):
+            return await func(target=target, **kwargs)
+
+        if use_cache and (cached := query_cache.get(key)) is not None:
+            return cached.copy()  # type: ignore
+
+        async def query() -> _R:
+            generation = query_cache.generation
+            result = await func(target=target, **kwargs)
+            if use_cache:
+                query_cache.set(
+                    key, target, kwargs.get("time_stop"), list(result), generation
+                )
+            return result
+
+        if not coalesce:
+            return await query()
+
+        if (future := _inflight.get(key)) is None:
+            future = _inflight[key] = asyncio.ensure_future(query())
+            future.add_done_callback(lambda _: _inflight.pop(key, None))
+        # 某个调用者被取消时不影响其他调用者
+        return list(await asyncio.shield(future))  # type: ignore
+
+    return wrapper
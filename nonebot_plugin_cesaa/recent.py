@@ -0,0 +1,68 @@
+# ruff: noqa: E501
+from collections import OrderedDict, deque
+from typing import Optional
+
+from .config import plugin_config
+from .hook import PersistedRecord, on_record_persisted
+
+
+class RecentBuffer:
+    """按事件场景保存最近消息记录的环形缓冲区
+
+    参数:
+      * ``depth: int``: 每个事件场景保留的消息记录数量
+      * ``max_records: int``: 所有事件场景保留的消息记录总数上限，超出时淘汰最久未活跃的事件场景
+    """
+
+    def __init__(self, depth: int, max_records: int) -> None:
+        self.depth = depth
+        self.max_records = max_records
+        self._buffers: OrderedDict[tuple[str, str, int], deque[PersistedRecord]] = (
+            OrderedDict()
+        )
+        self._size = 0
+
+    def append(self, record: PersistedRecord) -> None:
+        if (buffer := self._buffers.get(record.scene)) is None:
+            buffer = self._buffers[record.scene] = deque(maxlen=self.depth)
+        if len(buffer) == self.depth:
+            self._size -= 1
+        buffer.append(record)
+        self._size += 1
+        self._buffers.move_to_end(record.scene)
+        while self._size > self.max_records and len(self._buffers) > 1:
+            _, evicted = self._buffers.popitem(last=False)
+            self._size -= len(evicted)
+
+    def get(
+        self, scene: tuple[Optional[str], Optional[str], Optional[int]], limit: int
+    ) -> Optional[list[PersistedRecord]]:
+        """获取事件场景最近的 limit 条消息记录，按时间倒序排列
+
+        缓冲区中的记录不足 limit 条时返回 None，此时需要查询数据库。
+        """
+        if (buffer := self._buffers.get(scene)) is None or len(buffer) < limit:  # type: ignore
+            return None
+        self._buffers.move_to_end(scene)  # type: ignore
+        records = sorted(
+            buffer, key=lambda item: (item.record.time, item.record.id), reverse=True
+        )
+        return records[:limit]
+
+    def clear(self) -> None:
+        self._buffers.clear()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+
+recent_buffer = RecentBuffer(
+    plugin_config.cesaa_recent_cache_depth, plugin_config.cesaa_recent_cache_max_records
+)
+
+
+@on_record_persisted(lambda: plugin_config.cesaa_recent_cache)
+def _append_recent_records(records: list[PersistedRecord]) -> None:
+    for record in records:
+        recent_buffer.append(record)
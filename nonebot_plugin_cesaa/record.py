@@ -1,139 +1,134 @@
 # ruff: noqa: E501
-from collections.abc import Sequence
-from typing import Optional
+from collections.abc import AsyncIterator, Iterable, Sequence
+from typing import Any, Literal, Optional, TypeVar
 
 from nonebot.adapters import Message
 from nonebot_plugin_chatrecorder import MessageRecord, deserialize_message
-from nonebot_plugin_chatrecorder.record import filter_statement
-from nonebot_plugin_chatrecorder.utils import scope_value
 from nonebot_plugin_orm import get_session
-from nonebot_plugin_saa import (
-    PlatformTarget,
-    TargetDiscordChannel,
-    TargetDoDoChannel,
-    TargetDoDoPrivate,
-    TargetFeishuGroup,
-    TargetFeishuPrivate,
-    TargetKaiheilaChannel,
-    TargetKaiheilaPrivate,
-    TargetOB12Unknow,
-    TargetQQGroup,
-    TargetQQGroupOpenId,
-    TargetQQGuildChannel,
-    TargetQQGuildDirect,
-    TargetQQPrivate,
-    TargetQQPrivateOpenId,
-    TargetSatoriUnknown,
-    TargetTelegramCommon,
-    TargetTelegramForum,
+from nonebot_plugin_saa import PlatformTarget
+from nonebot_plugin_uninfo.orm import BotModel
+from sqlalchemy import ColumnElement, Row, Select, select
+
+from .config import plugin_config
+from .fields import MESSAGE_COLUMNS
+from .hook import PersistedRecord
+from .instrument import QueryTimer, execute_statement
+from .message import LazyMessage, deserialize_messages
+from .query_cache import cached_query
+from .recent import recent_buffer
+from .statement import (
+    build_statement,
+    count_parameters,
+    encode_cursor,
+    explain_statement,
+    max_parameters,
+    paginate_statement,
 )
-from nonebot_plugin_uninfo import SceneType, SupportScope
-from nonebot_plugin_uninfo.orm import BotModel, SceneModel, SessionModel, UserModel
-from sqlalchemy import ColumnElement, select
-
-
-def target_to_filter_statement(target: PlatformTarget) -> list[ColumnElement[bool]]:
-    """将 PlatformTarget 转换为 chatrecorder 所需参数"""
-    scope = None
-    scene_id = None
-    scene_type = None
-    if isinstance(target, TargetQQPrivate):
-        scope = SupportScope.qq_client
-        scene_id = str(target.user_id)
-        scene_type = SceneType.PRIVATE
-    elif isinstance(target, TargetQQGroup):
-        scope = SupportScope.qq_client
-        scene_id = str(target.group_id)
-        scene_type = SceneType.GROUP
-    elif isinstance(target, TargetQQGuildDirect):
-        scope = SupportScope.qq_guild
-        scene_id = str(target.recipient_id)
-        scene_type = SceneType.PRIVATE
-    elif isinstance(target, TargetQQGuildChannel):
-        scope = SupportScope.qq_guild
-        scene_id = str(target.channel_id)
-        scene_type = SceneType.CHANNEL_TEXT
-    elif isinstance(target, TargetQQPrivateOpenId):
-        scope = SupportScope.qq_api
-        scene_id = target.user_openid
-        scene_type = SceneType.PRIVATE
-    elif isinstance(target, TargetQQGroupOpenId):
-        scope = SupportScope.qq_api
-        scene_id = target.group_openid
-        scene_type = SceneType.GROUP
-    elif isinstance(target, TargetKaiheilaPrivate):
-        scope = SupportScope.kook
-        scene_id = target.user_id
-        scene_type = SceneType.PRIVATE
-    elif isinstance(target, TargetKaiheilaChannel):
-        scope = SupportScope.kook
-        scene_id = target.channel_id
-        scene_type = SceneType.CHANNEL_TEXT
-    elif isinstance(target, TargetFeishuPrivate):
-        scope = SupportScope.feishu
-        scene_id = target.open_id
-        scene_type = SceneType.PRIVATE
-    elif isinstance(target, TargetFeishuGroup):
-        scope = SupportScope.feishu
-        scene_id = target.chat_id
-        scene_type = SceneType.GROUP
-    elif isinstance(target, TargetTelegramCommon):
-        scope = SupportScope.telegram
-        scene_id = str(target.chat_id)
-        scene_type = SceneType.PRIVATE
-    elif isinstance(target, TargetTelegramForum):
-        scope = SupportScope.telegram
-        scene_id = str(target.message_thread_id)
-        scene_type = SceneType.CHANNEL_TEXT
-    elif isinstance(target, TargetDoDoPrivate):
-        scope = SupportScope.dodo
-        scene_id = target.dodo_source_id
-        scene_type = SceneType.PRIVATE
-    elif isinstance(target, TargetDoDoChannel):
-        scope = SupportScope.dodo
-        scene_id = target.channel_id
-        scene_type = SceneType.CHANNEL_TEXT
-    elif isinstance(target, TargetDiscordChannel):
-        scope = SupportScope.discord
-        scene_id = target.channel_id
-        scene_type = SceneType.CHANNEL_TEXT
-    elif isinstance(target, TargetOB12Unknow):
-        scope = SupportScope.ensure_ob12(target.platform)
-        if target.detail_type == "private":
-            scene_id = target.user_id
-            scene_type = SceneType.PRIVATE
-        elif target.detail_type == "group":
-            scene_id = target.group_id
-            scene_type = SceneType.GROUP
-        else:
-            scene_id = target.channel_id
-            scene_type = SceneType.CHANNEL_TEXT
-    elif isinstance(target, TargetSatoriUnknown):
-        scope = SupportScope.ensure_satori(target.platform)
-        if target.channel_id is None:
-            scene_id = target.user_id
-            scene_type = SceneType.PRIVATE
-        elif target.guild_id is None:
-            scene_id = target.channel_id
-            scene_type = SceneType.GROUP
-        else:
-            scene_id = target.channel_id
-            scene_type = SceneType.CHANNEL_TEXT
-    else:
-        raise ValueError(f"不支持的 PlatformTarget 类型：{target}")
-
-    whereclause: list[ColumnElement[bool]] = []
-    if scope is not None:
-        whereclause.append(BotModel.scope == scope_value(scope))
-    if scene_id:
-        whereclause.append(SceneModel.scene_id == scene_id)
-    if scene_type is not None:
-        whereclause.append(SceneModel.scene_type == scene_type.value)
-    return whereclause
+from .target import resolve_session_persist_ids_many, target_to_scene
+from .target import target_to_filter_statement as target_to_filter_statement
+
+_T = TypeVar("_T", bound=tuple[Any, ...])
+
+MessageField = Literal[
+    "id",
+    "session_persist_id",
+    "time",
+    "type",
+    "message_id",
+    "message",
+    "plain_text",
+    "self_id",
+    "adapter",
+    "scope",
+    "scene_id",
+    "scene_type",
+    "user_id",
+]
+""" `get_message_rows` 支持的字段 """
+
+
+def _next_cursor(rows: Sequence[Any], limit: int) -> Optional[str]:
+    """根据本页最后一条记录生成下一页的游标，已无更多记录时返回 None"""
+    if len(rows) < limit or not rows:
+        return None
+    return encode_cursor(rows[-1].time, rows[-1].id)
 
 
+def _get_recent_records(
+    target: Optional[PlatformTarget],
+    limit: Optional[int],
+    order: Optional[Literal["asc", "desc"]],
+    cursor: Optional[str],
+    kwargs: dict[str, Any],
+) -> Optional[list[PersistedRecord]]:
+    """尝试从内存中获取发送目标最近的消息记录，无法满足查询时返回 None"""
+    if (
+        not plugin_config.cesaa_recent_cache
+        or target is None
+        or limit is None
+        or order != "desc"
+        or cursor is not None
+        or kwargs
+    ):
+        return None
+    return recent_buffer.get(target_to_scene(target), limit)
+
+
+async def _build_targets_statements(
+    statement: Select[_T], targets: Iterable[PlatformTarget], **kwargs
+) -> tuple[
+    list[tuple[Select[_T], dict[int, list[PlatformTarget]]]], list[PlatformTarget]
+]:
+    """构建同时查询多个 PlatformTarget 的语句
+
+    会话持久化 id 过多时按 PlatformTarget 拆分为多条语句，使每条语句的参数数量不超过数据库的上限，
+    同一个 PlatformTarget 的消息记录只会由一条语句查询。
+
+    返回值为各条查询语句及其会话持久化 id 到 PlatformTarget 的映射，以及去重后的 PlatformTarget 列表
+    """
+    targets_session_persist_ids = await resolve_session_persist_ids_many(targets)
+    statement = await build_statement(statement, **kwargs)
+    async with get_session() as db_session:
+        dialect = db_session.get_bind(MessageRecord).dialect
+    budget = max_parameters(dialect.name) - count_parameters(statement, dialect)
+
+    chunks: list[dict[int, list[PlatformTarget]]] = [{}]
+    for target, session_persist_ids in targets_session_persist_ids.items():
+        if chunks[-1] and len(chunks[-1]) + len(session_persist_ids) > budget:
+            chunks.append({})
+        for session_persist_id in session_persist_ids:
+            chunks[-1].setdefault(session_persist_id, []).append(target)
+    return [
+        (
+            statement.where(MessageRecord.session_persist_id.in_(session_targets)),
+            session_targets,
+        )
+        for session_targets in chunks
+    ], list(targets_session_persist_ids)
+
+
+async def _execute_targets_statements(
+    timer: QueryTimer,
+    statements: list[tuple[Select[Any], dict[int, list[PlatformTarget]]]],
+    *,
+    scalars: bool = False,
+) -> list[tuple[Any, list[PlatformTarget]]]:
+    """依次执行各条查询语句，返回每一行及其所属的 PlatformTarget"""
+    results: list[tuple[Any, list[PlatformTarget]]] = []
+    for statement, session_targets in statements:
+        rows = await execute_statement(timer, statement, scalars=scalars)
+        results.extend((row, session_targets[row.session_persist_id]) for row in rows)
+    return results
+
+
+@cached_query
 async def get_message_records(
-    *, target: Optional[PlatformTarget] = None, **kwargs
+    *,
+    target: Optional[PlatformTarget] = None,
+    limit: Optional[int] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    cursor: Optional[str] = None,
+    **kwargs,
 ) -> Sequence[MessageRecord]:
     """获取消息记录
 
@@ -160,28 +155,37 @@ async def get_message_records(
       * ``time_start: Optional[datetime]``: 起始时间，为空表示不限制起始时间（传入带时区的时间或 UTC 时间）
       * ``time_stop: Optional[datetime]``: 结束时间，为空表示不限制结束时间（传入带时区的时间或 UTC 时间）
       * ``types: Optional[Iterable[Literal["message", "message_sent"]]]``: 消息事件类型列表，为空表示所有类型
+      * ``limit: Optional[int]``: 最多返回的记录数，为空表示不限制
+      * ``order: Optional[Literal["asc", "desc"]]``: 按消息时间排序的方向，为空表示不排序（传入 `limit` 或 `cursor` 时默认为升序）
+      * ``cursor: Optional[str]``: 分页游标，传入时仅返回该游标之后的记录
+      * ``coalesce: bool``: 是否与正在进行的相同查询共用一次数据库查询，返回的消息对象会在调用者之间共享
 
     返回值:
       * ``List[MessageRecord]``: 消息记录列表
     """
-    whereclause = filter_statement(**kwargs)
-    if target:
-        whereclause.extend(target_to_filter_statement(target))
-    statement = (
-        select(MessageRecord)
-        .where(*whereclause)
-        .join(SessionModel, SessionModel.id == MessageRecord.session_persist_id)
-        .join(BotModel, BotModel.id == SessionModel.bot_persist_id)
-        .join(SceneModel, SceneModel.id == SessionModel.scene_persist_id)
-        .join(UserModel, UserModel.id == SessionModel.user_persist_id)
+    if (
+        recent := _get_recent_records(target, limit, order, cursor, kwargs)
+    ) is not None:
+        return [item.record for item in recent]
+
+    timer = QueryTimer(
+        "get_message_records", target, kwargs, limit=limit, order=order, cursor=cursor
     )
-    async with get_session() as db_session:
-        records = (await db_session.scalars(statement)).all()
+    statement = await build_statement(select(MessageRecord), target, **kwargs)
+    statement = paginate_statement(statement, limit=limit, order=order, cursor=cursor)
+    records = await execute_statement(timer, statement, scalars=True)
+    timer.finish(len(records), (record.message for record in records))
     return records
 
 
+@cached_query
 async def get_messages(
-    *, target: Optional[PlatformTarget] = None, **kwargs
+    *,
+    target: Optional[PlatformTarget] = None,
+    limit: Optional[int] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    cursor: Optional[str] = None,
+    **kwargs,
 ) -> Sequence[Message]:
     """获取消息记录的消息列表
 
@@ -208,28 +212,83 @@ async def get_messages(
       * ``time_start: Optional[datetime]``: 起始时间，为空表示不限制起始时间（传入带时区的时间或 UTC 时间）
       * ``time_stop: Optional[datetime]``: 结束时间，为空表示不限制结束时间（传入带时区的时间或 UTC 时间）
       * ``types: Optional[Iterable[Literal["message", "message_sent"]]]``: 消息事件类型列表，为空表示所有类型
+      * ``limit: Optional[int]``: 最多返回的记录数，为空表示不限制
+      * ``order: Optional[Literal["asc", "desc"]]``: 按消息时间排序的方向，为空表示不排序（传入 `limit` 或 `cursor` 时默认为升序）
+      * ``cursor: Optional[str]``: 分页游标，传入时仅返回该游标之后的记录
+      * ``coalesce: bool``: 是否与正在进行的相同查询共用一次数据库查询，返回的消息对象会在调用者之间共享
 
     返回值:
       * ``List[Message]``: 消息列表
     """
-    whereclause = filter_statement(**kwargs)
-    if target:
-        whereclause.extend(target_to_filter_statement(target))
-    statement = (
-        select(MessageRecord.message, BotModel.adapter)
-        .where(*whereclause)
-        .join(SessionModel, SessionModel.id == MessageRecord.session_persist_id)
-        .join(BotModel, BotModel.id == SessionModel.bot_persist_id)
-        .join(SceneModel, SceneModel.id == SessionModel.scene_persist_id)
-        .join(UserModel, UserModel.id == SessionModel.user_persist_id)
+    if (
+        recent := _get_recent_records(target, limit, order, cursor, kwargs)
+    ) is not None:
+        return [
+            deserialize_message(item.adapter, item.record.message) for item in recent
+        ]
+
+    timer = QueryTimer(
+        "get_messages", target, kwargs, limit=limit, order=order, cursor=cursor
     )
-    async with get_session() as db_session:
-        results = (await db_session.execute(statement)).all()
-    return [deserialize_message(result[1], result[0]) for result in results]
+    statement = await build_statement(
+        select(MessageRecord.message, BotModel.adapter), target, **kwargs
+    )
+    statement = paginate_statement(statement, limit=limit, order=order, cursor=cursor)
+    results = await execute_statement(timer, statement)
+    messages = await deserialize_messages(
+        [(result[1], result[0]) for result in results]
+    )
+    timer.lap("deserialize_time")
+    timer.finish(len(results), (result[0] for result in results))
+    return messages
+
+
+@cached_query
+async def get_lazy_messages(
+    *,
+    target: Optional[PlatformTarget] = None,
+    limit: Optional[int] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    cursor: Optional[str] = None,
+    **kwargs,
+) -> Sequence[LazyMessage]:
+    """获取消息记录的延迟反序列化消息列表
+
+    与 `get_messages` 相同，但消息在首次访问时才会反序列化，适用于只需要查看部分消息的场景。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``coalesce: bool``: 是否与正在进行的相同查询共用一次数据库查询，返回的消息对象会在调用者之间共享
+      * ``**kwargs``: 筛选参数，具体查看 `get_messages` 中的定义
 
+    返回值:
+      * ``List[LazyMessage]``: 延迟反序列化的消息列表
+    """
+    if (
+        recent := _get_recent_records(target, limit, order, cursor, kwargs)
+    ) is not None:
+        return [LazyMessage(item.adapter, item.record.message) for item in recent]
+
+    timer = QueryTimer(
+        "get_lazy_messages", target, kwargs, limit=limit, order=order, cursor=cursor
+    )
+    statement = await build_statement(
+        select(MessageRecord.message, BotModel.adapter), target, **kwargs
+    )
+    statement = paginate_statement(statement, limit=limit, order=order, cursor=cursor)
+    results = await execute_statement(timer, statement)
+    timer.finish(len(results), (result[0] for result in results))
+    return [LazyMessage(result[1], result[0]) for result in results]
 
+
+@cached_query
 async def get_messages_plain_text(
-    *, target: Optional[PlatformTarget] = None, **kwargs
+    *,
+    target: Optional[PlatformTarget] = None,
+    limit: Optional[int] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    cursor: Optional[str] = None,
+    **kwargs,
 ) -> Sequence[str]:
     """获取消息记录的纯文本消息列表
 
@@ -256,21 +315,375 @@ async def get_messages_plain_text(
       * ``time_start: Optional[datetime]``: 起始时间，为空表示不限制起始时间（传入带时区的时间或 UTC 时间）
       * ``time_stop: Optional[datetime]``: 结束时间，为空表示不限制结束时间（传入带时区的时间或 UTC 时间）
       * ``types: Optional[Iterable[Literal["message", "message_sent"]]]``: 消息事件类型列表，为空表示所有类型
+      * ``limit: Optional[int]``: 最多返回的记录数，为空表示不限制
+      * ``order: Optional[Literal["asc", "desc"]]``: 按消息时间排序的方向，为空表示不排序（传入 `limit` 或 `cursor` 时默认为升序）
+      * ``cursor: Optional[str]``: 分页游标，传入时仅返回该游标之后的记录
+      * ``coalesce: bool``: 是否与正在进行的相同查询共用一次数据库查询，返回的消息对象会在调用者之间共享
 
     返回值:
       * ``List[str]``: 纯文本消息列表
     """
-    whereclause = filter_statement(**kwargs)
-    if target:
-        whereclause.extend(target_to_filter_statement(target))
-    statement = (
-        select(MessageRecord.plain_text)
-        .where(*whereclause)
-        .join(SessionModel, SessionModel.id == MessageRecord.session_persist_id)
-        .join(BotModel, BotModel.id == SessionModel.bot_persist_id)
-        .join(SceneModel, SceneModel.id == SessionModel.scene_persist_id)
-        .join(UserModel, UserModel.id == SessionModel.user_persist_id)
+    if (
+        recent := _get_recent_records(target, limit, order, cursor, kwargs)
+    ) is not None:
+        return [item.record.plain_text for item in recent]
+
+    timer = QueryTimer(
+        "get_messages_plain_text",
+        target,
+        kwargs,
+        limit=limit,
+        order=order,
+        cursor=cursor,
     )
-    async with get_session() as db_session:
-        records = (await db_session.scalars(statement)).all()
+    statement = await build_statement(
+        select(MessageRecord.plain_text), target, **kwargs
+    )
+    statement = paginate_statement(statement, limit=limit, order=order, cursor=cursor)
+    records = await execute_statement(timer, statement, scalars=True)
+    timer.finish(len(records), records)
     return records
+
+
+@cached_query
+async def get_message_rows(
+    *,
+    target: Optional[PlatformTarget] = None,
+    fields: Sequence[MessageField],
+    limit: Optional[int] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    cursor: Optional[str] = None,
+    **kwargs,
+) -> Sequence[Row[Any]]:
+    """获取消息记录的指定字段
+
+    只查询并连接所需的列与表，返回的行不会被数据库会话跟踪，适用于只需要少量字段的统计分析。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``fields: Sequence[MessageField]``: 需要的字段，可以是消息记录的字段，也可以是 `self_id`、`adapter`、`scope`、`scene_id`、`scene_type` 与 `user_id`
+      * ``limit: Optional[int]``: 最多返回的记录数，为空表示不限制
+      * ``order: Optional[Literal["asc", "desc"]]``: 按消息时间排序的方向
+      * ``cursor: Optional[str]``: 分页游标
+      * ``coalesce: bool``: 是否与正在进行的相同查询共用一次数据库查询，返回的消息对象会在调用者之间共享
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``List[Row]``: 按 `fields` 顺序排列的元组，也可以通过字段名访问
+    """
+    if not fields:
+        raise ValueError("至少需要一个字段")
+    columns: list[ColumnElement[Any]] = []
+    for field in fields:
+        if (column := MESSAGE_COLUMNS.get(field)) is None:
+            raise ValueError(f"不支持的字段：{field}")
+        columns.append(column.label(field))
+
+    timer = QueryTimer(
+        "get_message_rows", target, kwargs, limit=limit, order=order, cursor=cursor
+    )
+    # 只查询关联表的字段时仍然以消息记录表为起点连接
+    statement = await build_statement(
+        select(*columns).select_from(MessageRecord), target, **kwargs
+    )
+    statement = paginate_statement(statement, limit=limit, order=order, cursor=cursor)
+    rows = await execute_statement(timer, statement)
+    timer.finish(len(rows))
+    return rows
+
+
+async def explain(
+    *,
+    target: Optional[PlatformTarget] = None,
+    limit: Optional[int] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    cursor: Optional[str] = None,
+    **kwargs,
+) -> list[str]:
+    """获取 `get_message_records` 在数据库中的执行计划
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``limit: Optional[int]``: 最多返回的记录数，为空表示不限制
+      * ``order: Optional[Literal["asc", "desc"]]``: 按消息时间排序的方向
+      * ``cursor: Optional[str]``: 分页游标
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``List[str]``: 执行计划，每行一项
+    """
+    statement = await build_statement(select(MessageRecord), target, **kwargs)
+    statement = paginate_statement(statement, limit=limit, order=order, cursor=cursor)
+    async with get_session() as db_session:
+        return await explain_statement(db_session, statement, MessageRecord)
+
+
+async def get_message_records_page(
+    *,
+    target: Optional[PlatformTarget] = None,
+    limit: int,
+    order: Literal["asc", "desc"] = "asc",
+    cursor: Optional[str] = None,
+    **kwargs,
+) -> tuple[Sequence[MessageRecord], Optional[str]]:
+    """分页获取消息记录
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``limit: int``: 每页记录数
+      * ``order: Literal["asc", "desc"]``: 按消息时间排序的方向
+      * ``cursor: Optional[str]``: 分页游标，为空表示从第一页开始
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``Tuple[List[MessageRecord], Optional[str]]``: 消息记录列表与下一页的游标，没有下一页时游标为 None
+    """
+    records = await get_message_records(
+        target=target, limit=limit, order=order, cursor=cursor, **kwargs
+    )
+    return records, _next_cursor(records, limit)
+
+
+async def get_messages_page(
+    *,
+    target: Optional[PlatformTarget] = None,
+    limit: int,
+    order: Literal["asc", "desc"] = "asc",
+    cursor: Optional[str] = None,
+    **kwargs,
+) -> tuple[Sequence[Message], Optional[str]]:
+    """分页获取消息记录的消息列表
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``limit: int``: 每页记录数
+      * ``order: Literal["asc", "desc"]``: 按消息时间排序的方向
+      * ``cursor: Optional[str]``: 分页游标，为空表示从第一页开始
+      * ``**kwargs``: 筛选参数，具体查看 `get_messages` 中的定义
+
+    返回值:
+      * ``Tuple[List[Message], Optional[str]]``: 消息列表与下一页的游标，没有下一页时游标为 None
+    """
+    timer = QueryTimer(
+        "get_messages_page", target, kwargs, limit=limit, order=order, cursor=cursor
+    )
+    statement = await build_statement(
+        select(
+            MessageRecord.message,
+            BotModel.adapter,
+            MessageRecord.time,
+            MessageRecord.id,
+        ),
+        target,
+        **kwargs,
+    )
+    statement = paginate_statement(statement, limit=limit, order=order, cursor=cursor)
+    results = await execute_statement(timer, statement)
+    messages = await deserialize_messages(
+        [(result[1], result[0]) for result in results]
+    )
+    timer.lap("deserialize_time")
+    timer.finish(len(results), (result[0] for result in results))
+    return messages, _next_cursor(results, limit)
+
+
+async def get_messages_plain_text_page(
+    *,
+    target: Optional[PlatformTarget] = None,
+    limit: int,
+    order: Literal["asc", "desc"] = "asc",
+    cursor: Optional[str] = None,
+    **kwargs,
+) -> tuple[Sequence[str], Optional[str]]:
+    """分页获取消息记录的纯文本消息列表
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``limit: int``: 每页记录数
+      * ``order: Literal["asc", "desc"]``: 按消息时间排序的方向
+      * ``cursor: Optional[str]``: 分页游标，为空表示从第一页开始
+      * ``**kwargs``: 筛选参数，具体查看 `get_messages_plain_text` 中的定义
+
+    返回值:
+      * ``Tuple[List[str], Optional[str]]``: 纯文本消息列表与下一页的游标，没有下一页时游标为 None
+    """
+    timer = QueryTimer(
+        "get_messages_plain_text_page",
+        target,
+        kwargs,
+        limit=limit,
+        order=order,
+        cursor=cursor,
+    )
+    statement = await build_statement(
+        select(MessageRecord.plain_text, MessageRecord.time, MessageRecord.id),
+        target,
+        **kwargs,
+    )
+    statement = paginate_statement(statement, limit=limit, order=order, cursor=cursor)
+    results = await execute_statement(timer, statement)
+    timer.finish(len(results), (result[0] for result in results))
+    return [result[0] for result in results], _next_cursor(results, limit)
+
+
+async def get_message_records_for_targets(
+    targets: Iterable[PlatformTarget], **kwargs
+) -> dict[PlatformTarget, list[MessageRecord]]:
+    """批量获取多个发送目标的消息记录
+
+    所有发送目标合并为一次查询（会话数量超过数据库参数上限时拆分为多次），结果按发送目标分组。
+
+    参数:
+      * ``targets: Iterable[PlatformTarget]``: 发送目标列表
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``Dict[PlatformTarget, List[MessageRecord]]``: 每个发送目标的消息记录列表
+    """
+    timer = QueryTimer("get_message_records_for_targets", None, kwargs)
+    statements, targets = await _build_targets_statements(
+        select(MessageRecord), targets, **kwargs
+    )
+    records = await _execute_targets_statements(timer, statements, scalars=True)
+    timer.finish(len(records), (record.message for record, _ in records))
+    results: dict[PlatformTarget, list[MessageRecord]] = {
+        target: [] for target in targets
+    }
+    for record, record_targets in records:
+        for target in record_targets:
+            results[target].append(record)
+    return results
+
+
+async def get_messages_for_targets(
+    targets: Iterable[PlatformTarget], **kwargs
+) -> dict[PlatformTarget, list[Message]]:
+    """批量获取多个发送目标的消息列表
+
+    所有发送目标合并为一次查询（会话数量超过数据库参数上限时拆分为多次），结果按发送目标分组。
+
+    参数:
+      * ``targets: Iterable[PlatformTarget]``: 发送目标列表
+      * ``**kwargs``: 筛选参数，具体查看 `get_messages` 中的定义
+
+    返回值:
+      * ``Dict[PlatformTarget, List[Message]]``: 每个发送目标的消息列表
+    """
+    timer = QueryTimer("get_messages_for_targets", None, kwargs)
+    statements, targets = await _build_targets_statements(
+        select(
+            MessageRecord.session_persist_id, MessageRecord.message, BotModel.adapter
+        ),
+        targets,
+        **kwargs,
+    )
+    results = await _execute_targets_statements(timer, statements)
+    messages: dict[PlatformTarget, list[Message]] = {target: [] for target in targets}
+    deserialized = await deserialize_messages(
+        [(result[2], result[1]) for result, _ in results]
+    )
+    for (_, result_targets), message in zip(results, deserialized):
+        for target in result_targets:
+            messages[target].append(message)
+    timer.lap("deserialize_time")
+    timer.finish(len(results), (result[1] for result, _ in results))
+    return messages
+
+
+async def get_messages_plain_text_for_targets(
+    targets: Iterable[PlatformTarget], **kwargs
+) -> dict[PlatformTarget, list[str]]:
+    """批量获取多个发送目标的纯文本消息列表
+
+    所有发送目标合并为一次查询（会话数量超过数据库参数上限时拆分为多次），结果按发送目标分组。
+
+    参数:
+      * ``targets: Iterable[PlatformTarget]``: 发送目标列表
+      * ``**kwargs``: 筛选参数，具体查看 `get_messages_plain_text` 中的定义
+
+    返回值:
+      * ``Dict[PlatformTarget, List[str]]``: 每个发送目标的纯文本消息列表
+    """
+    timer = QueryTimer("get_messages_plain_text_for_targets", None, kwargs)
+    statements, targets = await _build_targets_statements(
+        select(MessageRecord.session_persist_id, MessageRecord.plain_text),
+        targets,
+        **kwargs,
+    )
+    results = await _execute_targets_statements(timer, statements)
+    timer.finish(len(results), (result[1] for result, _ in results))
+    messages: dict[PlatformTarget, list[str]] = {target: [] for target in targets}
+    for result, result_targets in results:
+        for target in result_targets:
+            messages[target].append(result[1])
+    return messages
+
+
+async def stream_message_records(
+    *, target: Optional[PlatformTarget] = None, yield_per: int = 1000, **kwargs
+) -> AsyncIterator[MessageRecord]:
+    """流式获取消息记录
+
+    使用服务端游标分批读取，适用于数据量较大的场景，内存占用与总记录数无关。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``yield_per: int``: 每批从数据库读取的记录数
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``AsyncIterator[MessageRecord]``: 消息记录异步迭代器
+    """
+    statement = await build_statement(select(MessageRecord), target, **kwargs)
+    statement = statement.execution_options(yield_per=yield_per)
+    async with get_session() as db_session:
+        async for record in await db_session.stream_scalars(statement):
+            yield record
+
+
+async def stream_messages(
+    *, target: Optional[PlatformTarget] = None, yield_per: int = 1000, **kwargs
+) -> AsyncIterator[Message]:
+    """流式获取消息记录的消息
+
+    使用服务端游标分批读取，适用于数据量较大的场景，内存占用与总记录数无关。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``yield_per: int``: 每批从数据库读取的记录数
+      * ``**kwargs``: 筛选参数，具体查看 `get_messages` 中的定义
+
+    返回值:
+      * ``AsyncIterator[Message]``: 消息异步迭代器
+    """
+    statement = await build_statement(
+        select(MessageRecord.message, BotModel.adapter), target, **kwargs
+    )
+    statement = statement.execution_options(yield_per=yield_per)
+    async with get_session() as db_session:
+        async for result in await db_session.stream(statement):
+            yield deserialize_message(result[1], result[0])
+
+
+async def stream_messages_plain_text(
+    *, target: Optional[PlatformTarget] = None, yield_per: int = 1000, **kwargs
+) -> AsyncIterator[str]:
+    """流式获取消息记录的纯文本消息
+
+    使用服务端游标分批读取，适用于数据量较大的场景，内存占用与总记录数无关。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``yield_per: int``: 每批从数据库读取的记录数
+      * ``**kwargs``: 筛选参数，具体查看 `get_messages_plain_text` 中的定义
+
+    返回值:
+      * ``AsyncIterator[str]``: 纯文本消息异步迭代器
+    """
+    statement = await build_statement(
+        select(MessageRecord.plain_text), target, **kwargs
+    )
+    statement = statement.execution_options(yield_per=yield_per)
+    async with get_session() as db_session:
+        async for plain_text in await db_session.stream_scalars(statement):
+            yield plain_text
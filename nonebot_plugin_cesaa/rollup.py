@@ -0,0 +1,272 @@
+# ruff: noqa: E501
+from collections.abc import Iterable
+from datetime import date, datetime, time, timedelta
+from typing import TYPE_CHECKING, Any, NamedTuple, Optional, Union
+
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import PlatformTarget
+from nonebot_plugin_uninfo.orm import BotModel, SceneModel, UserModel
+from sqlalchemy import (
+    ColumnElement,
+    Connection,
+    delete,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+
+from .config import plugin_config
+from .hook import PersistedRecord, on_record_flushed
+from .model import MessageRollup
+from .statement import bucket_expression, join_statement
+from .target import target_to_scene
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import InstrumentedAttribute
+
+_RollupKey = tuple[str, int, str, date, str]
+""" (平台类型, 事件场景类型, 事件场景 id, 日期, 用户 id) """
+
+
+class DailyMessageCount(NamedTuple):
+    """一天的消息统计"""
+
+    day: date
+    """ 日期，按 UTC 时间划分 """
+    user_id: Optional[str]
+    """ 用户 id，未按用户统计时为 None """
+    messages: int
+    """ 消息数量 """
+    chars: int
+    """ 纯文本消息的字符数之和 """
+
+
+def _rollup_where(key: _RollupKey) -> list[ColumnElement[bool]]:
+    scope, scene_type, scene_id, day, user_id = key
+    return [
+        MessageRollup.scope == scope,
+        MessageRollup.scene_type == scene_type,
+        MessageRollup.scene_id == scene_id,
+        MessageRollup.day == day,
+        MessageRollup.user_id == user_id,
+    ]
+
+
+def _add_to_rollup(
+    connection: Connection, key: _RollupKey, count: int, chars: int
+) -> None:
+    statement = (
+        update(MessageRollup)
+        .where(*_rollup_where(key))
+        .values(count=MessageRollup.count + count, chars=MessageRollup.chars + chars)
+    )
+    if connection.execute(statement).rowcount:
+        return
+    scope, scene_type, scene_id, day, user_id = key
+    try:
+        with connection.begin_nested():
+            connection.execute(
+                insert(MessageRollup).values(
+                    scope=scope,
+                    scene_type=scene_type,
+                    scene_id=scene_id,
+                    day=day,
+                    user_id=user_id,
+                    count=count,
+                    chars=chars,
+                )
+            )
+    except IntegrityError:
+        # 同时有其他事务创建了这一行
+        connection.execute(statement)
+
+
+@on_record_flushed(lambda: plugin_config.cesaa_rollup, MessageRollup)
+def _update_rollup(connection: Connection, records: list[PersistedRecord]) -> None:
+    deltas: dict[_RollupKey, list[int]] = {}
+    for item in records:
+        scope, scene_id, scene_type = item.scene
+        key = (scope, scene_type, scene_id, item.record.time.date(), item.user_id)
+        delta = deltas.setdefault(key, [0, 0])
+        delta[0] += 1
+        delta[1] += len(item.record.plain_text)
+    for key, (count, chars) in deltas.items():
+        _add_to_rollup(connection, key, count, chars)
+
+
+def _text_length(dialect: str) -> ColumnElement[int]:
+    # MySQL 的 LENGTH 返回字节数，需要与写入时的 len 一致按字符计算
+    if dialect == "sqlite":
+        return func.length(MessageRecord.plain_text)
+    return func.char_length(MessageRecord.plain_text)
+
+
+def _to_date(value: Union[str, datetime]) -> date:
+    # SQLite 与 MySQL 返回字符串，PostgreSQL 返回时间
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value.date()
+
+
+async def backfill_rollup(
+    *,
+    day_start: Optional[date] = None,
+    day_stop: Optional[date] = None,
+    batch_days: int = 30,
+) -> int:
+    """根据已有的消息记录重新计算每日消息统计
+
+    每次处理 `batch_days` 天，先删除这些天已有的统计再重新写入，每批在一个事务中完成。
+    请在开启 `cesaa_rollup` 之前执行，或者只处理开启之前的日期，否则处理期间写入的消息可能被重复统计或遗漏。
+
+    参数:
+      * ``day_start: Optional[date]``: 起始日期（UTC），为空时从最早的消息记录开始
+      * ``day_stop: Optional[date]``: 结束日期（UTC，包含当天），为空时到最新的消息记录为止
+      * ``batch_days: int``: 每批处理的天数
+
+    返回值:
+      * ``int``: 写入的统计行数
+    """
+    if batch_days < 1:
+        raise ValueError("每批处理的天数必须大于 0")
+    if day_start is None or day_stop is None:
+        first: Optional[datetime]
+        last: datetime
+        async with get_session() as db_session:
+            first, last = (
+                await db_session.execute(
+                    select(func.min(MessageRecord.time), func.max(MessageRecord.time))
+                )
+            ).one()
+        if first is None:
+            return 0
+        if day_start is None:
+            day_start = first.date()
+        if day_stop is None:
+            day_stop = last.date()
+
+    written = 0
+    batch_start = day_start
+    while batch_start <= day_stop:
+        batch_stop = min(batch_start + timedelta(days=batch_days - 1), day_stop)
+        written += await _backfill_batch(batch_start, batch_stop)
+        batch_start = batch_stop + timedelta(days=1)
+    return written
+
+
+async def _backfill_batch(day_start: date, day_stop: date) -> int:
+    async with get_session() as db_session:
+        dialect = db_session.get_bind(MessageRecord).dialect.name
+        day = bucket_expression(dialect, "day").label("day_bucket")
+        statement = join_statement(
+            select(
+                BotModel.scope,
+                SceneModel.scene_type,
+                SceneModel.scene_id,
+                day,
+                UserModel.user_id,
+                func.count(MessageRecord.id),
+                func.coalesce(func.sum(_text_length(dialect)), 0),
+            ),
+            MessageRecord.time >= datetime.combine(day_start, time()),
+            MessageRecord.time < datetime.combine(day_stop + timedelta(days=1), time()),
+        ).group_by(
+            BotModel.scope,
+            SceneModel.scene_type,
+            SceneModel.scene_id,
+            day,
+            UserModel.user_id,
+        )
+        rows = (await db_session.execute(statement)).all()
+
+        await db_session.execute(
+            delete(MessageRollup).where(
+                MessageRollup.day >= day_start, MessageRollup.day <= day_stop
+            )
+        )
+        # 同一平台的不同机器人可能处于同一事件场景，需要合并
+        rollups: dict[_RollupKey, list[int]] = {}
+        for scope, scene_type, scene_id, bucket, user_id, count, chars in rows:
+            key = (scope, scene_type, scene_id, _to_date(bucket), user_id)
+            rollup = rollups.setdefault(key, [0, 0])
+            rollup[0] += count
+            rollup[1] += chars
+        if rollups:
+            await db_session.execute(
+                insert(MessageRollup),
+                [
+                    {
+                        "scope": scope,
+                        "scene_type": scene_type,
+                        "scene_id": scene_id,
+                        "day": day,
+                        "user_id": user_id,
+                        "count": count,
+                        "chars": chars,
+                    }
+                    for (scope, scene_type, scene_id, day, user_id), (
+                        count,
+                        chars,
+                    ) in rollups.items()
+                ],
+            )
+        await db_session.commit()
+    return len(rollups)
+
+
+async def get_daily_message_counts(
+    *,
+    target: Optional[PlatformTarget] = None,
+    day_start: Optional[date] = None,
+    day_stop: Optional[date] = None,
+    user_ids: Optional[Iterable[str]] = None,
+    by_user: bool = False,
+) -> list[DailyMessageCount]:
+    """从每日消息统计中获取消息数量
+
+    查询代价只与天数（按用户统计时还有用户数）有关，与消息数量无关。
+    需要开启 `cesaa_rollup`，开启之前的消息可以通过 `backfill_rollup` 补充。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``day_start: Optional[date]``: 起始日期（UTC），为空表示不限制
+      * ``day_stop: Optional[date]``: 结束日期（UTC，包含当天），为空表示不限制
+      * ``user_ids: Optional[Iterable[str]]``: 用户 id 列表，为空表示所有用户
+      * ``by_user: bool``: 是否按用户分别统计
+
+    返回值:
+      * ``List[DailyMessageCount]``: 每天的消息统计，按日期排序，按用户统计时同一天按用户 id 排序
+    """
+    columns: list[InstrumentedAttribute[Any]] = [MessageRollup.day]
+    if by_user:
+        columns.append(MessageRollup.user_id)
+    statement = select(
+        *columns, func.sum(MessageRollup.count), func.sum(MessageRollup.chars)
+    )
+    if target:
+        scope, scene_id, scene_type = target_to_scene(target)
+        if scope is not None:
+            statement = statement.where(MessageRollup.scope == scope)
+        if scene_id is not None:
+            statement = statement.where(MessageRollup.scene_id == scene_id)
+        if scene_type is not None:
+            statement = statement.where(MessageRollup.scene_type == scene_type)
+    if day_start is not None:
+        statement = statement.where(MessageRollup.day >= day_start)
+    if day_stop is not None:
+        statement = statement.where(MessageRollup.day <= day_stop)
+    if user_ids is not None:
+        statement = statement.where(MessageRollup.user_id.in_(user_ids))
+    statement = statement.group_by(*columns).order_by(*columns)
+
+    async with get_session() as db_session:
+        results = (await db_session.execute(statement)).all()
+    if by_user:
+        return [
+            DailyMessageCount(day, user_id, count, chars)
+            for day, user_id, count, chars in results
+        ]
+    return [DailyMessageCount(day, None, count, chars) for day, count, chars in results]
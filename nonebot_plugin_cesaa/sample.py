@@ -0,0 +1,222 @@
+# ruff: noqa: E501
+import random
+from collections.abc import Sequence
+from typing import Any, Optional
+
+from nonebot.adapters import Message
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import PlatformTarget
+from nonebot_plugin_uninfo.orm import BotModel
+from sqlalchemy import Select, func, select, tablesample, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.util import ClauseAdapter
+
+from .instrument import QueryTimer, execute_statement
+from .message import deserialize_messages
+from .statement import (
+    build_statement,
+    count_parameters,
+    join_statement,
+    max_parameters,
+)
+
+_PROBE_ROUNDS = 4
+""" 随机探测的最多轮数 """
+_PROBE_BATCH = 100
+""" 每条查询语句中的最多探测数量 """
+_TABLESAMPLE_OVERSAMPLE = 4
+""" TABLESAMPLE 抽样比例相对于所需数量的倍数 """
+
+
+def _random(dialect: str) -> Any:
+    return func.rand() if dialect in ("mysql", "mariadb") else func.random()
+
+
+async def _tablesample_ids(
+    db_session: AsyncSession, statement: Select[Any], n: int
+) -> list[int]:
+    """在 PostgreSQL 中使用 TABLESAMPLE 按数据块抽样
+
+    抽样比例根据表的估计行数计算，筛选条件过滤掉大部分数据时抽到的数量可能不足。
+    """
+    reltuples = await db_session.scalar(
+        text("SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+        {"table": MessageRecord.__tablename__},
+    )
+    if not reltuples or reltuples <= 0:
+        # 表尚未被统计过
+        return []
+    percent = min(100.0, 100.0 * n * _TABLESAMPLE_OVERSAMPLE / reltuples)
+    sampled = tablesample(MessageRecord.__table__, func.system(percent))
+    statement = ClauseAdapter(sampled).traverse(
+        statement.order_by(func.random()).limit(n)
+    )
+    return list((await db_session.scalars(statement)).all())
+
+
+def _probe_statement(statement: Select[Any], probe: int) -> Select[Any]:
+    return (
+        statement.where(MessageRecord.id >= probe).order_by(MessageRecord.id).limit(1)
+    )
+
+
+async def _probe_ids(
+    db_session: AsyncSession, statement: Select[Any], n: int, chosen: set[int]
+) -> None:
+    """在消息记录 id 的范围内随机探测，取每个随机 id 之后第一条符合条件的消息记录
+
+    每次探测从随机 id 开始沿主键索引查找，筛选条件匹配的消息记录较多时很快就能找到。
+    筛选条件只匹配少量消息记录时，最坏情况下一次探测需要扫描到 id 范围的末尾。
+    消息记录 id 分布不均匀时，紧跟在较大间隔之后的消息记录被抽到的概率更高。
+    """
+    bounds = statement.with_only_columns(
+        func.min(MessageRecord.id), func.max(MessageRecord.id)
+    )
+    low, high = (await db_session.execute(bounds)).one()
+    if low is None:
+        return
+
+    # 每次探测都会重复筛选条件中的参数，例如发送目标对应的所有会话 id，
+    # 需要根据参数数量限制每条查询语句中的探测数量
+    dialect = db_session.get_bind(MessageRecord).dialect
+    parameters = count_parameters(_probe_statement(statement, low), dialect)
+    batch = max(1, min(_PROBE_BATCH, max_parameters(dialect.name) // parameters))
+
+    for _ in range(_PROBE_ROUNDS):
+        if (need := n - len(chosen)) <= 0:
+            return
+        # 多探测一些，抵消重复的结果
+        probes = [random.randint(low, high) for _ in range(need * 2)]
+        for i in range(0, len(probes), batch):
+            subqueries = [
+                _probe_statement(statement, probe).scalar_subquery()
+                for probe in probes[i : i + batch]
+            ]
+            ids = await db_session.scalars(
+                select(MessageRecord.id).where(MessageRecord.id.in_(subqueries))
+            )
+            chosen.update(ids)
+
+
+async def _sample_ids(
+    db_session: AsyncSession, statement: Select[Any], n: int
+) -> list[int]:
+    dialect = db_session.get_bind(MessageRecord).dialect.name
+    chosen: set[int] = set()
+    if dialect == "postgresql":
+        chosen.update(await _tablesample_ids(db_session, statement, n))
+    if len(chosen) < n:
+        await _probe_ids(db_session, statement, n, chosen)
+    if (need := n - len(chosen)) > 0:
+        # 符合条件的消息记录不多于所需数量，剩下的部分直接随机排序
+        # 已经抽到的 id 可能很多，不放入查询语句中，多取一些再排除
+        rest = statement.order_by(_random(dialect)).limit(n)
+        rest_ids = (await db_session.scalars(rest)).all()
+        chosen.update([i for i in rest_ids if i not in chosen][:need])
+    ids = list(chosen)
+    random.shuffle(ids)
+    return ids[:n]
+
+
+async def _sample(
+    timer: QueryTimer,
+    columns: Sequence[Any],
+    target: Optional[PlatformTarget],
+    n: int,
+    kwargs: dict[str, Any],
+    *,
+    scalars: bool = False,
+) -> Sequence[Any]:
+    if n < 0:
+        raise ValueError("抽样数量不能小于 0")
+    if n == 0:
+        return []
+    statement = await build_statement(select(MessageRecord.id), target, **kwargs)
+    async with get_session() as db_session:
+        ids = await _sample_ids(db_session, statement, n)
+        dialect = db_session.get_bind(MessageRecord).dialect.name
+    timer.lap("sql_time")
+    if not ids:
+        return []
+
+    # 抽到的消息记录已经符合筛选条件，只需要连接查询列用到的表
+    # 抽样数量可能超过参数数量的上限，分批获取后再排序
+    chunk_size = max_parameters(dialect)
+    rows: list[Any] = []
+    for i in range(0, len(ids), chunk_size):
+        statement = join_statement(
+            select(*columns, MessageRecord.time, MessageRecord.id),
+            MessageRecord.id.in_(ids[i : i + chunk_size]),
+        )
+        rows.extend(await execute_statement(timer, statement))
+    rows.sort(key=lambda row: (row[-2], row[-1]))
+    if scalars:
+        return [row[0] for row in rows]
+    return [row[: len(columns)] for row in rows]
+
+
+async def sample_message_records(
+    *, target: Optional[PlatformTarget] = None, n: int, **kwargs
+) -> list[MessageRecord]:
+    """在数据库中随机抽取消息记录
+
+    PostgreSQL 中先使用 TABLESAMPLE 抽样，其他数据库在消息记录 id 的范围内随机探测，不会读取全部消息记录。
+    内存占用只与抽样数量有关，筛选条件只匹配少量消息记录时探测会变慢。结果按 (消息时间, 消息记录 id) 升序排列。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``n: int``: 抽样数量，符合条件的消息记录不足时返回全部
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``List[MessageRecord]``: 消息记录列表
+    """
+    timer = QueryTimer("sample_message_records", target, kwargs, n=n)
+    records = await _sample(timer, [MessageRecord], target, n, kwargs, scalars=True)
+    timer.finish(len(records), (record.message for record in records))
+    return list(records)
+
+
+async def sample_messages(
+    *, target: Optional[PlatformTarget] = None, n: int, **kwargs
+) -> list[Message]:
+    """在数据库中随机抽取消息
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``n: int``: 抽样数量，符合条件的消息记录不足时返回全部
+      * ``**kwargs``: 筛选参数，具体查看 `get_messages` 中的定义
+
+    返回值:
+      * ``List[Message]``: 消息列表
+    """
+    timer = QueryTimer("sample_messages", target, kwargs, n=n)
+    results = await _sample(
+        timer, [MessageRecord.message, BotModel.adapter], target, n, kwargs
+    )
+    messages = await deserialize_messages(
+        [(result[1], result[0]) for result in results]
+    )
+    timer.lap("deserialize_time")
+    timer.finish(len(results), (result[0] for result in results))
+    return messages
+
+
+async def sample_messages_plain_text(
+    *, target: Optional[PlatformTarget] = None, n: int, **kwargs
+) -> list[str]:
+    """在数据库中随机抽取纯文本消息
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``n: int``: 抽样数量，符合条件的消息记录不足时返回全部
+      * ``**kwargs``: 筛选参数，具体查看 `get_messages_plain_text` 中的定义
+
+    返回值:
+      * ``List[str]``: 纯文本消息列表
+    """
+    timer = QueryTimer("sample_messages_plain_text", target, kwargs, n=n)
+    results = await _sample(timer, [MessageRecord.plain_text], target, n, kwargs)
+    timer.finish(len(results), (result[0] for result in results))
+    return [result[0] for result in results]
@@ -0,0 +1,140 @@
+# ruff: noqa: E501
+from collections.abc import Sequence
+from typing import Literal, Optional, Union
+from weakref import WeakSet
+
+from nonebot import logger
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import PlatformTarget
+from sqlalchemy import (
+    ColumnElement,
+    Connection,
+    Engine,
+    column,
+    select,
+    table,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .statement import build_statement, paginate_statement
+
+_MESSAGE_TABLE = MessageRecord.__tablename__
+_FTS_TABLE = "nonebot_plugin_cesaa_fts"
+
+# trigram 分词器按三个字符切分，可以直接匹配中文等没有空格分词的文本
+_SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} USING fts5(plain_text, content='{_MESSAGE_TABLE}', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {_FTS_TABLE}_ai AFTER INSERT ON {_MESSAGE_TABLE} BEGIN "
+    f"INSERT INTO {_FTS_TABLE}(rowid, plain_text) VALUES (new.id, new.plain_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {_FTS_TABLE}_ad AFTER DELETE ON {_MESSAGE_TABLE} BEGIN "
+    f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}, rowid, plain_text) VALUES ('delete', old.id, old.plain_text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {_FTS_TABLE}_au AFTER UPDATE OF plain_text ON {_MESSAGE_TABLE} BEGIN "
+    f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}, rowid, plain_text) VALUES ('delete', old.id, old.plain_text); "
+    f"INSERT INTO {_FTS_TABLE}(rowid, plain_text) VALUES (new.id, new.plain_text); END",
+    f"INSERT INTO {_FTS_TABLE}({_FTS_TABLE}) VALUES ('rebuild')",
+]
+_fts_table = table(_FTS_TABLE, column("rowid"), column("plain_text"))
+# 只记录已经存在全文索引的数据库，不存在时每次重新检查，以便其他进程创建后直接使用
+_search_index_binds: "WeakSet[Union[Engine, Connection]]" = WeakSet()
+
+
+async def build_search_index() -> bool:
+    """创建全文索引，并为已有的消息记录建立索引
+
+    * SQLite: 创建使用 trigram 分词器的 FTS5 表，并通过触发器在插入消息记录时自动更新
+    * PostgreSQL: 基于 pg_trgm 的 GIN 索引由本插件的迁移脚本创建，请执行 `nb orm upgrade`
+    * 其他数据库: 不需要额外的索引，搜索时使用 LIKE
+
+    可以重复执行，在 SQLite 中重复执行会重建索引。
+
+    返回值:
+      * ``bool``: 是否创建了索引
+    """
+    async with get_session() as db_session:
+        bind = db_session.get_bind(MessageRecord)
+        dialect = bind.dialect.name
+        if dialect == "postgresql":
+            logger.info("PostgreSQL 的全文索引由迁移脚本创建，请执行 nb orm upgrade")
+            return False
+        if dialect != "sqlite":
+            logger.info(f"{dialect} 不需要创建全文索引，搜索时将使用 LIKE")
+            return False
+        for statement in _SQLITE_DDL:
+            await db_session.execute(text(statement))
+        await db_session.commit()
+        _search_index_binds.add(bind)
+    return True
+
+
+async def _is_search_index_available(
+    db_session: AsyncSession, bind: Union[Engine, Connection]
+) -> bool:
+    if bind in _search_index_binds:
+        return True
+    statement = text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    )
+    if (await db_session.scalar(statement, {"name": _FTS_TABLE})) is None:
+        return False
+    _search_index_binds.add(bind)
+    return True
+
+
+async def _search_clause(db_session: AsyncSession, query: str) -> ColumnElement[bool]:
+    bind = db_session.get_bind(MessageRecord)
+    dialect = bind.dialect.name
+    if dialect == "sqlite":
+        # trigram 分词器无法用于少于三个字符的查询
+        if len(query) >= 3 and await _is_search_index_available(db_session, bind):
+            phrase = '"' + query.replace('"', '""') + '"'
+            return MessageRecord.id.in_(
+                select(_fts_table.c.rowid).where(
+                    text(f"{_FTS_TABLE} MATCH :query").bindparams(query=phrase)
+                )
+            )
+    elif dialect == "postgresql":
+        # ILIKE 可以使用 pg_trgm 的 GIN 索引
+        return MessageRecord.plain_text.ilike(f"%{_escape_like(query)}%", escape="/")
+    return MessageRecord.plain_text.contains(query, autoescape=True)
+
+
+def _escape_like(query: str) -> str:
+    return query.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+
+async def search_messages(
+    *,
+    target: Optional[PlatformTarget] = None,
+    query: str,
+    limit: Optional[int] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    cursor: Optional[str] = None,
+    **kwargs,
+) -> Sequence[MessageRecord]:
+    """搜索包含关键词的消息记录
+
+    匹配消息的纯文本内容，不区分大小写。
+    已通过 `build_search_index` 创建全文索引时使用索引查询，否则使用 LIKE。
+
+    参数:
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选
+      * ``query: str``: 搜索的关键词
+      * ``limit: Optional[int]``: 最多返回的记录数，为空表示不限制
+      * ``order: Optional[Literal["asc", "desc"]]``: 按消息时间排序的方向
+      * ``cursor: Optional[str]``: 分页游标，传入时仅返回该游标之后的记录
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义
+
+    返回值:
+      * ``List[MessageRecord]``: 消息记录列表
+    """
+    if not query:
+        raise ValueError("搜索关键词不能为空")
+    statement = await build_statement(select(MessageRecord), target, **kwargs)
+    async with get_session() as db_session:
+        statement = statement.where(await _search_clause(db_session, query))
+        statement = paginate_statement(
+            statement, limit=limit, order=order, cursor=cursor
+        )
+        return (await db_session.scalars(statement)).all()
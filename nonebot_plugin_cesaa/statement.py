@@ -0,0 +1,199 @@
+import base64
+import json
+import sqlite3
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Literal, Optional, TypeVar, Union
+
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_chatrecorder.record import filter_statement
+from nonebot_plugin_orm import Model
+from nonebot_plugin_saa import PlatformTarget
+from nonebot_plugin_uninfo.orm import BotModel, SceneModel, SessionModel, UserModel
+from sqlalchemy import (
+    ClauseElement,
+    ColumnElement,
+    Executable,
+    FromClause,
+    Select,
+    and_,
+    func,
+    literal_column,
+    or_,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.util import find_tables
+
+from .target import resolve_session_persist_ids
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Dialect
+
+_T = TypeVar("_T", bound=tuple[Any, ...])
+
+_JOINS: list[tuple[type[Model], ColumnElement[bool]]] = [
+    (BotModel, BotModel.id == SessionModel.bot_persist_id),
+    (SceneModel, SceneModel.id == SessionModel.scene_persist_id),
+    (UserModel, UserModel.id == SessionModel.user_persist_id),
+]
+
+
+_BUCKET_FORMATS = {
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+}
+
+
+def bucket_expression(
+    dialect: str, bucket: Literal["hour", "day"]
+) -> ColumnElement[Union[str, datetime]]:
+    """按数据库类型生成将消息时间截断到指定精度的表达式"""
+    if bucket not in _BUCKET_FORMATS:
+        raise ValueError(f"不支持的时间精度：{bucket}")
+    if dialect == "sqlite":
+        return func.strftime(_BUCKET_FORMATS[bucket], MessageRecord.time)
+    if dialect == "postgresql":
+        # 使用字面量，保证 GROUP BY 与 SELECT 中的表达式完全一致
+        return func.date_trunc(literal_column(f"'{bucket}'"), MessageRecord.time)
+    if dialect in ("mysql", "mariadb"):
+        return func.date_format(MessageRecord.time, _BUCKET_FORMATS[bucket])
+    raise ValueError(f"不支持的数据库类型：{dialect}")
+
+
+def max_parameters(dialect: str) -> int:
+    """一条查询语句中最多可以使用的参数数量"""
+    if dialect == "sqlite":
+        # SQLite 3.32.0 之前默认最多 999 个
+        return 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+    if dialect in ("mysql", "mariadb"):
+        return 65535
+    return 32767
+
+
+def count_parameters(statement: Select[Any], dialect: "Dialect") -> int:
+    """查询语句展开 IN 列表后的参数数量"""
+    return len(
+        statement.compile(
+            dialect=dialect, compile_kwargs={"render_postcompile": True}
+        ).params
+    )
+
+
+async def build_statement(
+    statement: Select[_T], target: Optional[PlatformTarget] = None, **kwargs
+) -> Select[_T]:
+    """为查询语句添加筛选条件与所需的表连接
+
+    `target` 会预先解析为会话持久化 id，直接在消息记录表上筛选。
+    仅连接筛选条件与查询列实际用到的表，没有用到时只扫描消息记录表。
+    """
+    whereclause = filter_statement(**kwargs)
+    if target:
+        session_persist_ids = await resolve_session_persist_ids(target)
+        whereclause.append(MessageRecord.session_persist_id.in_(session_persist_ids))
+    return join_statement(statement, *whereclause)
+
+
+def join_statement(
+    statement: Select[_T], *whereclause: ColumnElement[bool]
+) -> Select[_T]:
+    """为查询语句添加筛选条件，并连接查询列与筛选条件所引用的表"""
+    tables: set[FromClause] = set()
+    for clause in (*statement.selected_columns, *whereclause):
+        tables.update(find_tables(clause, check_columns=True))
+
+    joins = [
+        (model, onclause) for model, onclause in _JOINS if model.__table__ in tables
+    ]
+    if joins or SessionModel.__table__ in tables:
+        statement = statement.join(
+            SessionModel, SessionModel.id == MessageRecord.session_persist_id
+        )
+    for model, onclause in joins:
+        statement = statement.join(model, onclause)
+    return statement.where(*whereclause)
+
+
+def encode_cursor(time: datetime, id: int) -> str:
+    """将 (消息时间, 消息记录 id) 编码为分页游标"""
+    data = json.dumps([time.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """解码分页游标"""
+    try:
+        time, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(time), int(id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"无效的分页游标：{cursor}") from e
+
+
+def paginate_statement(
+    statement: Select[_T],
+    *,
+    limit: Optional[int] = None,
+    order: Optional[Literal["asc", "desc"]] = None,
+    cursor: Optional[str] = None,
+) -> Select[_T]:
+    """为查询语句添加基于 (消息时间, 消息记录 id) 的键集分页
+
+    与 OFFSET 不同，无论翻到第几页，查询代价都与第一页相同。
+    """
+    if order is None and (limit is not None or cursor is not None):
+        order = "asc"
+    if cursor is not None:
+        time, id = decode_cursor(cursor)
+        if order == "desc":
+            statement = statement.where(
+                or_(
+                    MessageRecord.time < time,
+                    and_(MessageRecord.time == time, MessageRecord.id < id),
+                )
+            )
+        else:
+            statement = statement.where(
+                or_(
+                    MessageRecord.time > time,
+                    and_(MessageRecord.time == time, MessageRecord.id > id),
+                )
+            )
+    if order == "desc":
+        statement = statement.order_by(
+            MessageRecord.time.desc(), MessageRecord.id.desc()
+        )
+    elif order == "asc":
+        statement = statement.order_by(MessageRecord.time, MessageRecord.id)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+
+class Explain(Executable, ClauseElement):
+    """获取查询语句的执行计划"""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select[Any]) -> None:
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element: Explain, compiler: SQLCompiler, **kwargs) -> str:
+    prefix = "EXPLAIN QUERY PLAN" if compiler.dialect.name == "sqlite" else "EXPLAIN"
+    return f"{prefix} {compiler.process(element.statement, **kwargs)}"
+
+
+async def explain_statement(
+    db_session: AsyncSession, statement: Select[Any], mapper: type[Model]
+) -> list[str]:
+    """获取查询语句在数据库中的执行计划，每行一项"""
+    dialect = db_session.get_bind(mapper).dialect
+    rows = (
+        await db_session.execute(Explain(statement), bind_arguments={"mapper": mapper})
+    ).all()
+    if dialect.name == "sqlite":
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [" ".join(str(value) for value in row) for row in rows]
@@ -0,0 +1,510 @@
+# ruff: noqa: E501
+from collections.abc import Iterable, Sequence
+from functools import lru_cache
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+from nonebot.compat import type_validate_python
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_chatrecorder.utils import scope_value
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import (
+    PlatformTarget,
+    TargetDiscordChannel,
+    TargetDoDoChannel,
+    TargetDoDoPrivate,
+    TargetFeishuGroup,
+    TargetFeishuPrivate,
+    TargetKaiheilaChannel,
+    TargetKaiheilaPrivate,
+    TargetOB12Unknow,
+    TargetQQGroup,
+    TargetQQGroupOpenId,
+    TargetQQGuildChannel,
+    TargetQQGuildDirect,
+    TargetQQPrivate,
+    TargetQQPrivateOpenId,
+    TargetSatoriUnknown,
+    TargetTelegramCommon,
+    TargetTelegramForum,
+)
+from nonebot_plugin_saa.registries import BotSpecifier
+from nonebot_plugin_uninfo import SceneType, SupportAdapter, SupportScope
+from nonebot_plugin_uninfo.orm import BotModel, SceneModel, SessionModel
+from pydantic import ValidationError
+from sqlalchemy import ColumnElement, Row, and_, or_, select
+from sqlalchemy.orm import aliased
+
+from .cache import LRUCache
+from .config import plugin_config
+from .hook import on_session_persisted
+
+# 批量查询时每条语句最多使用的参数数量，与 SQLite 3.32.0 之前的上限一致
+_MAX_PARAMETERS = 999
+
+_session_persist_ids_cache: LRUCache[PlatformTarget, list[int]] = LRUCache(
+    plugin_config.cesaa_target_cache_size, plugin_config.cesaa_target_cache_ttl
+)
+# 每次清空缓存时增加，用于丢弃查询期间已经过时的结果
+_cache_generation = 0
+
+
+TargetScene = tuple[Optional[str], Optional[str], Optional[int]]
+""" PlatformTarget 对应的 (平台类型, 事件场景 id, 事件场景类型) """
+TargetResolver = Callable[[Any], TargetScene]
+""" 将 PlatformTarget 转换为 TargetScene 的函数 """
+TargetEntry = Union[tuple[Union[str, SupportScope], str, SceneType], TargetResolver]
+""" (平台类型, 事件场景 id 所在字段, 事件场景类型) 或转换函数 """
+
+
+class SessionScene(NamedTuple):
+    """会话所在的事件场景"""
+
+    adapter: str
+    """ 适配器名称 """
+    self_id: str
+    """ 机器人 id """
+    scope: str
+    """ 平台类型 """
+    scene_id: str
+    """ 事件场景 id """
+    scene_type: int
+    """ 事件场景类型 """
+    parent_scene_id: Optional[str]
+    """ 父级事件场景 id，没有时为 None """
+
+
+TargetBuilder = Callable[[SessionScene], Optional[PlatformTarget]]
+""" 根据会话所在的事件场景生成 PlatformTarget 的函数，无法生成时返回 None """
+
+
+def _ob12_scene(target: TargetOB12Unknow) -> TargetScene:
+    scope = scope_value(SupportScope.ensure_ob12(target.platform))
+    if target.detail_type == "private":
+        return scope, target.user_id or None, SceneType.PRIVATE.value
+    elif target.detail_type == "group":
+        return scope, target.group_id or None, SceneType.GROUP.value
+    return scope, target.channel_id or None, SceneType.CHANNEL_TEXT.value
+
+
+def _satori_scene(target: TargetSatoriUnknown) -> TargetScene:
+    scope = scope_value(SupportScope.ensure_satori(target.platform))
+    if target.channel_id is None:
+        return scope, target.user_id or None, SceneType.PRIVATE.value
+    elif target.guild_id is None:
+        return scope, target.channel_id or None, SceneType.GROUP.value
+    return scope, target.channel_id or None, SceneType.CHANNEL_TEXT.value
+
+
+def _qq_guild_direct_target(scene: SessionScene) -> Optional[PlatformTarget]:
+    if scene.parent_scene_id is None:
+        return None
+    return TargetQQGuildDirect(
+        recipient_id=int(scene.scene_id), source_guild_id=int(scene.parent_scene_id)
+    )
+
+
+def _telegram_forum_target(scene: SessionScene) -> Optional[PlatformTarget]:
+    if scene.parent_scene_id is None:
+        return None
+    return TargetTelegramForum(
+        chat_id=int(scene.parent_scene_id), message_thread_id=int(scene.scene_id)
+    )
+
+
+def _dodo_private_target(scene: SessionScene) -> Optional[PlatformTarget]:
+    if scene.parent_scene_id is None:
+        return None
+    return TargetDoDoPrivate(
+        island_source_id=scene.parent_scene_id, dodo_source_id=scene.scene_id
+    )
+
+
+_OB12_PLATFORMS = {
+    scope_value(SupportScope.ensure_ob12(platform)): platform
+    for platform in ["qq", "qqguild", "discord", "wechat", "kaiheila"]
+}
+_OB12_DETAIL_TYPES = {
+    SceneType.PRIVATE.value: ("private", "user_id"),
+    SceneType.GROUP.value: ("group", "group_id"),
+    SceneType.CHANNEL_TEXT.value: ("channel", "channel_id"),
+}
+
+
+def _ob12_target(scene: SessionScene) -> Optional[PlatformTarget]:
+    if scene.adapter != SupportAdapter.onebot12.value:
+        return None
+    platform = _OB12_PLATFORMS.get(scene.scope)
+    detail = _OB12_DETAIL_TYPES.get(scene.scene_type)
+    if platform is None or detail is None:
+        return None
+    detail_type, field = detail
+    guild_id = scene.parent_scene_id if detail_type == "channel" else None
+    return type_validate_python(
+        TargetOB12Unknow,
+        {
+            "platform": platform,
+            "detail_type": detail_type,
+            "guild_id": guild_id,
+            field: scene.scene_id,
+        },
+    )
+
+
+# 同一平台类型对应多个 Satori 平台时无法确定，不做转换
+_SATORI_PLATFORMS = {
+    scope_value(SupportScope.ensure_satori(platform)): platform
+    for platform in [
+        "telegram",
+        "discord",
+        "feishu",
+        "wechat-official",
+        "wecom",
+        "kook",
+        "dingtalk",
+        "mail",
+    ]
+}
+
+
+def _satori_target(scene: SessionScene) -> Optional[PlatformTarget]:
+    if scene.adapter != SupportAdapter.satori.value:
+        return None
+    if (platform := _SATORI_PLATFORMS.get(scene.scope)) is None:
+        return None
+    if scene.scene_type == SceneType.PRIVATE.value:
+        return TargetSatoriUnknown(platform=platform, user_id=scene.scene_id)
+    if scene.scene_type == SceneType.GROUP.value:
+        return TargetSatoriUnknown(platform=platform, channel_id=scene.scene_id)
+    if scene.scene_type == SceneType.CHANNEL_TEXT.value:
+        return TargetSatoriUnknown(
+            platform=platform,
+            guild_id=scene.parent_scene_id,
+            channel_id=scene.scene_id,
+        )
+    return None
+
+
+_target_registry: dict[type[PlatformTarget], TargetEntry] = {
+    TargetQQPrivate: (SupportScope.qq_client, "user_id", SceneType.PRIVATE),
+    TargetQQGroup: (SupportScope.qq_client, "group_id", SceneType.GROUP),
+    TargetQQGuildDirect: (SupportScope.qq_guild, "recipient_id", SceneType.PRIVATE),
+    TargetQQGuildChannel: (SupportScope.qq_guild, "channel_id", SceneType.CHANNEL_TEXT),
+    TargetQQPrivateOpenId: (SupportScope.qq_api, "user_openid", SceneType.PRIVATE),
+    TargetQQGroupOpenId: (SupportScope.qq_api, "group_openid", SceneType.GROUP),
+    TargetKaiheilaPrivate: (SupportScope.kook, "user_id", SceneType.PRIVATE),
+    TargetKaiheilaChannel: (SupportScope.kook, "channel_id", SceneType.CHANNEL_TEXT),
+    TargetFeishuPrivate: (SupportScope.feishu, "open_id", SceneType.PRIVATE),
+    TargetFeishuGroup: (SupportScope.feishu, "chat_id", SceneType.GROUP),
+    TargetTelegramCommon: (SupportScope.telegram, "chat_id", SceneType.PRIVATE),
+    TargetTelegramForum: (
+        SupportScope.telegram,
+        "message_thread_id",
+        SceneType.CHANNEL_TEXT,
+    ),
+    TargetDoDoPrivate: (SupportScope.dodo, "dodo_source_id", SceneType.PRIVATE),
+    TargetDoDoChannel: (SupportScope.dodo, "channel_id", SceneType.CHANNEL_TEXT),
+    TargetDiscordChannel: (SupportScope.discord, "channel_id", SceneType.CHANNEL_TEXT),
+    TargetOB12Unknow: _ob12_scene,
+    TargetSatoriUnknown: _satori_scene,
+}
+_target_builders: dict[type[PlatformTarget], TargetBuilder] = {
+    TargetQQGuildDirect: _qq_guild_direct_target,
+    TargetTelegramForum: _telegram_forum_target,
+    TargetDoDoPrivate: _dodo_private_target,
+    TargetOB12Unknow: _ob12_target,
+    TargetSatoriUnknown: _satori_target,
+}
+_target_scene_cache: LRUCache[PlatformTarget, TargetScene] = LRUCache(
+    plugin_config.cesaa_target_cache_size
+)
+_session_target_cache: LRUCache[int, Optional[PlatformTarget]] = LRUCache(
+    plugin_config.cesaa_target_cache_size
+)
+
+
+def register_target(
+    target_type: type[PlatformTarget],
+    entry: TargetEntry,
+    builder: Optional[TargetBuilder] = None,
+) -> None:
+    """注册 PlatformTarget 类型与事件场景的对应关系
+
+    参数:
+      * ``target_type: Type[PlatformTarget]``: PlatformTarget 类型，其子类同样适用
+      * ``entry: TargetEntry``: (平台类型, 事件场景 id 所在字段, 事件场景类型)，或者接收 PlatformTarget 返回 (平台类型, 事件场景 id, 事件场景类型) 的函数
+      * ``builder: Optional[TargetBuilder]``: `records_to_targets` 使用的反向转换函数，`entry` 为元组时默认将事件场景 id 填入对应字段，为函数时默认不做反向转换
+    """
+    _target_registry[target_type] = entry
+    if builder is not None:
+        _target_builders[target_type] = builder
+    else:
+        _target_builders.pop(target_type, None)
+    _clear_registry_caches()
+
+
+def _clear_registry_caches() -> None:
+    """注册表改变后清空所有依赖注册表的缓存"""
+    _target_scene_cache.clear()
+    _scene_filter_statement.cache_clear()
+    _reverse_registry.cache_clear()
+    _session_target_cache.clear()
+    clear_target_cache()
+
+
+def _get_target_entry(target: PlatformTarget) -> TargetEntry:
+    for cls in type(target).__mro__:
+        if (entry := _target_registry.get(cls)) is not None:
+            return entry
+    raise ValueError(f"不支持的 PlatformTarget 类型：{target}")
+
+
+def target_to_scene(target: PlatformTarget) -> TargetScene:
+    """将 PlatformTarget 转换为 (平台类型, 事件场景 id, 事件场景类型)"""
+    try:
+        if (scene := _target_scene_cache.get(target)) is not None:
+            return scene
+    except TypeError:
+        # 不可哈希的 PlatformTarget 不缓存
+        return _resolve_target_scene(target)
+    scene = _resolve_target_scene(target)
+    _target_scene_cache.set(target, scene)
+    return scene
+
+
+def _resolve_target_scene(target: PlatformTarget) -> TargetScene:
+    entry = _get_target_entry(target)
+    if callable(entry):
+        return entry(target)
+    scope, field, scene_type = entry
+    scene_id = getattr(target, field)
+    return (
+        scope_value(scope),
+        str(scene_id) if scene_id is not None and scene_id != "" else None,
+        scene_type.value,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _scene_filter_statement(scene: TargetScene) -> tuple[ColumnElement[bool], ...]:
+    # 相同场景复用同一组筛选条件，省去重复构造语句的开销
+    # 具体的值均为绑定参数，同一类型的 PlatformTarget 可以命中 SQLAlchemy 的编译缓存
+    scope, scene_id, scene_type = scene
+    whereclause: list[ColumnElement[bool]] = []
+    if scope is not None:
+        whereclause.append(BotModel.scope == scope)
+    if scene_id is not None:
+        whereclause.append(SceneModel.scene_id == scene_id)
+    if scene_type is not None:
+        whereclause.append(SceneModel.scene_type == scene_type)
+    return tuple(whereclause)
+
+
+def target_to_filter_statement(target: PlatformTarget) -> list[ColumnElement[bool]]:
+    """将 PlatformTarget 转换为 chatrecorder 所需参数"""
+    return list(_scene_filter_statement(target_to_scene(target)))
+
+
+def match_scene(scene: TargetScene, row: TargetScene) -> bool:
+    return all(value is None or value == row[i] for i, value in enumerate(scene))
+
+
+async def resolve_session_persist_ids(target: PlatformTarget) -> list[int]:
+    """获取 PlatformTarget 对应的所有会话持久化 id
+
+    结果会被缓存，在有新会话写入数据库时失效。
+    """
+    if (session_persist_ids := _session_persist_ids_cache.get(target)) is not None:
+        return session_persist_ids
+
+    generation = _cache_generation
+    statement = (
+        select(SessionModel.id)
+        .join(BotModel, BotModel.id == SessionModel.bot_persist_id)
+        .join(SceneModel, SceneModel.id == SessionModel.scene_persist_id)
+        .where(*target_to_filter_statement(target))
+    )
+    async with get_session() as db_session:
+        session_persist_ids = list((await db_session.scalars(statement)).all())
+    # 查询期间有新会话写入时，结果可能不包含新会话
+    if generation == _cache_generation:
+        _session_persist_ids_cache.set(target, session_persist_ids)
+    return session_persist_ids
+
+
+async def resolve_session_persist_ids_many(
+    targets: Iterable[PlatformTarget],
+) -> dict[PlatformTarget, list[int]]:
+    """批量获取多个 PlatformTarget 对应的会话持久化 id
+
+    未命中缓存的 PlatformTarget 会合并为一次查询。
+    """
+    results: dict[PlatformTarget, list[int]] = {}
+    misses: dict[PlatformTarget, TargetScene] = {}
+    for target in targets:
+        if (session_persist_ids := _session_persist_ids_cache.get(target)) is not None:
+            results[target] = session_persist_ids
+        elif target not in misses:
+            misses[target] = target_to_scene(target)
+    if not misses:
+        return results
+
+    generation = _cache_generation
+    statement = (
+        select(
+            SessionModel.id, BotModel.scope, SceneModel.scene_id, SceneModel.scene_type
+        )
+        .join(BotModel, BotModel.id == SessionModel.bot_persist_id)
+        .join(SceneModel, SceneModel.id == SessionModel.scene_persist_id)
+    )
+    rows: list[Row[tuple[int, str, str, int]]] = []
+    miss_targets = list(misses)
+    # 每个 PlatformTarget 最多使用三个参数
+    chunk_size = _MAX_PARAMETERS // 3
+    async with get_session() as db_session:
+        for i in range(0, len(miss_targets), chunk_size):
+            chunk = miss_targets[i : i + chunk_size]
+            rows.extend(
+                await db_session.execute(
+                    statement.where(
+                        or_(*[and_(*target_to_filter_statement(t)) for t in chunk])
+                    )
+                )
+            )
+
+    # 大多数 PlatformTarget 的三个字段都不为空，可以直接按字段查找
+    exact: dict[TargetScene, list[PlatformTarget]] = {}
+    partial: list[tuple[PlatformTarget, TargetScene]] = []
+    for target, scene in misses.items():
+        results[target] = []
+        if None in scene:
+            partial.append((target, scene))
+        else:
+            exact.setdefault(scene, []).append(target)
+    for session_persist_id, scope, scene_id, scene_type in rows:
+        row = (scope, scene_id, scene_type)
+        for target in exact.get(row, []):
+            results[target].append(session_persist_id)
+        for target, scene in partial:
+            if match_scene(scene, row):
+                results[target].append(session_persist_id)
+
+    if generation == _cache_generation:
+        for target in misses:
+            _session_persist_ids_cache.set(target, results[target])
+    return results
+
+
+@on_session_persisted
+def clear_target_cache() -> None:
+    """清空 PlatformTarget 解析结果的缓存"""
+    global _cache_generation
+    _cache_generation += 1
+    _session_persist_ids_cache.clear()
+
+
+def _field_builder(target_type: type[PlatformTarget], field: str) -> TargetBuilder:
+    def builder(scene: SessionScene) -> Optional[PlatformTarget]:
+        data = {field: scene.scene_id}
+        # 需要指定机器人的 PlatformTarget
+        if issubclass(target_type, BotSpecifier):
+            data["bot_id"] = scene.self_id
+        try:
+            return type_validate_python(target_type, data)
+        except ValidationError:
+            return None
+
+    return builder
+
+
+@lru_cache(maxsize=1)
+def _reverse_registry() -> tuple[
+    dict[tuple[str, int], TargetBuilder], tuple[TargetBuilder, ...]
+]:
+    """根据注册表生成 (平台类型, 事件场景类型) 到反向转换函数的对应关系
+
+    后注册的 PlatformTarget 类型优先；没有固定平台类型的转换函数按顺序逐个尝试。
+    """
+    exact: dict[tuple[str, int], TargetBuilder] = {}
+    fallback: list[TargetBuilder] = []
+    for target_type, entry in _target_registry.items():
+        builder = _target_builders.get(target_type)
+        if callable(entry):
+            if builder is not None:
+                fallback.append(builder)
+            continue
+        scope, field, scene_type = entry
+        exact[(scope_value(scope), scene_type.value)] = builder or _field_builder(
+            target_type, field
+        )
+    return exact, tuple(fallback)
+
+
+def scene_to_target(scene: SessionScene) -> Optional[PlatformTarget]:
+    """将会话所在的事件场景转换为 PlatformTarget，无法转换时返回 None"""
+    exact, fallback = _reverse_registry()
+    if (builder := exact.get((scene.scope, scene.scene_type))) is not None:
+        return builder(scene)
+    for builder in fallback:
+        if (target := builder(scene)) is not None:
+            return target
+    return None
+
+
+async def records_to_targets(
+    records: Sequence[MessageRecord],
+) -> list[Optional[PlatformTarget]]:
+    """获取每条消息记录所在的 PlatformTarget
+
+    所有未缓存的会话通过一次查询获取，结果与传入的消息记录一一对应，无法转换的消息记录对应 None。
+
+    参数:
+      * ``records: Sequence[MessageRecord]``: 消息记录列表，也可以是包含 `session_persist_id` 的查询结果
+
+    返回值:
+      * ``List[Optional[PlatformTarget]]``: 与消息记录一一对应的 PlatformTarget 列表
+    """
+    targets: dict[int, Optional[PlatformTarget]] = {}
+    misses: set[int] = set()
+    for record in records:
+        session_persist_id = record.session_persist_id
+        if session_persist_id in targets or session_persist_id in misses:
+            continue
+        if (target := _session_target_cache.get(session_persist_id)) is not None:
+            targets[session_persist_id] = target
+        else:
+            misses.add(session_persist_id)
+
+    if misses:
+        parent = aliased(SceneModel)
+        statement = (
+            select(
+                SessionModel.id,
+                BotModel.adapter,
+                BotModel.self_id,
+                BotModel.scope,
+                SceneModel.scene_id,
+                SceneModel.scene_type,
+                parent.scene_id,
+            )
+            .join(BotModel, BotModel.id == SessionModel.bot_persist_id)
+            .join(SceneModel, SceneModel.id == SessionModel.scene_persist_id)
+            .outerjoin(parent, parent.id == SceneModel.parent_scene_persist_id)
+        )
+        rows: list[Row[tuple[int, str, str, str, str, int, str]]] = []
+        miss_ids = list(misses)
+        async with get_session() as db_session:
+            for i in range(0, len(miss_ids), _MAX_PARAMETERS):
+                chunk = miss_ids[i : i + _MAX_PARAMETERS]
+                rows.extend(
+                    await db_session.execute(
+                        statement.where(SessionModel.id.in_(chunk))
+                    )
+                )
+        for session_persist_id, *scene in rows:
+            target = scene_to_target(SessionScene(*scene))
+            targets[session_persist_id] = target
+            # 会话所在的事件场景不会改变，缓存以 None 表示未命中，无法转换的结果不缓存
+            if target is not None:
+                _session_target_cache.set(session_persist_id, target)
+
+    return [targets.get(record.session_persist_id) for record in records]
@@ -0,0 +1,146 @@
+# ruff: noqa: E501
+import hashlib
+import json
+from collections.abc import AsyncIterator, Iterable, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, Optional
+
+from nonebot_plugin_chatrecorder import MessageRecord
+from nonebot_plugin_orm import get_session
+from nonebot_plugin_saa import PlatformTarget
+from nonebot_plugin_uninfo import Session
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .instrument import QueryTimer, execute_statement
+from .model import ConsumerWatermark
+from .statement import build_statement, encode_cursor, paginate_statement
+from .target import target_to_scene
+
+# 时间范围只限制每次获取的消息记录，不改变消费者处理的消息
+_WINDOW_KWARGS = ("time_start", "time_stop")
+
+
+def _normalize_filter(value: Any) -> Any:
+    if isinstance(value, Session):
+        return asdict(value)
+    if isinstance(value, Iterable) and not isinstance(value, str):
+        return sorted(str(getattr(item, "value", item)) for item in value)
+    return value
+
+
+def _target_key(target: Optional[PlatformTarget], kwargs: dict[str, Any]) -> str:
+    """根据发送目标与筛选参数生成位置的键，筛选参数以摘要表示，避免超出字段长度"""
+    key = json.dumps(target_to_scene(target)) if target else ""
+    filters = {
+        name: _normalize_filter(value)
+        for name, value in kwargs.items()
+        if name not in _WINDOW_KWARGS and value is not None
+    }
+    if not filters:
+        return key
+    digest = hashlib.sha256(
+        json.dumps(filters, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"{key}#{digest[:16]}"
+
+
+async def _advance_watermark(consumer: str, target: str, record: MessageRecord) -> None:
+    """将消费者的位置前移到指定消息记录，位置只会前进不会后退"""
+    statement = (
+        update(ConsumerWatermark)
+        .where(
+            ConsumerWatermark.consumer == consumer,
+            ConsumerWatermark.target == target,
+            or_(
+                ConsumerWatermark.time < record.time,
+                and_(
+                    ConsumerWatermark.time == record.time,
+                    ConsumerWatermark.record_id < record.id,
+                ),
+            ),
+        )
+        .values(time=record.time, record_id=record.id)
+    )
+    async with get_session() as db_session:
+        if (await db_session.execute(statement)).rowcount:  # type: ignore
+            await db_session.commit()
+            return
+        exists = await db_session.scalar(
+            select(ConsumerWatermark.id).where(
+                ConsumerWatermark.consumer == consumer,
+                ConsumerWatermark.target == target,
+            )
+        )
+        if exists is not None:
+            # 其他调用已经处理到更后面的位置
+            return
+        db_session.add(
+            ConsumerWatermark(
+                consumer=consumer, target=target, time=record.time, record_id=record.id
+            )
+        )
+        try:
+            await db_session.commit()
+        except IntegrityError:
+            # 同时有其他调用创建了记录，重新尝试前移
+            await db_session.rollback()
+            await db_session.execute(statement)
+            await db_session.commit()
+
+
+@asynccontextmanager
+async def get_new_messages(
+    *,
+    consumer: str,
+    target: Optional[PlatformTarget] = None,
+    limit: Optional[int] = None,
+    **kwargs,
+) -> AsyncIterator[Sequence[MessageRecord]]:
+    """获取消费者上次处理之后的新消息记录
+
+    消息记录按 (消息时间, 消息记录 id) 升序排列。
+    `async with` 块正常结束时，消费者的位置会前移到最后一条消息记录；块中抛出异常时位置不变，下次会重新获取这些消息记录。
+
+    用法:
+        ```python
+        async with get_new_messages(consumer="wordcloud", target=target) as records:
+            ...
+        ```
+
+    参数:
+      * ``consumer: str``: 消费者名称，不同名称的位置相互独立
+      * ``target: Optional[PlatformTarget]``: 发送目标，传入时会根据 `PlatformTarget` 中的字段筛选，不同发送目标的位置相互独立
+      * ``limit: Optional[int]``: 每次最多获取的记录数，为空表示不限制
+      * ``**kwargs``: 筛选参数，具体查看 `get_message_records` 中的定义，除 `time_start` 与 `time_stop` 外，不同筛选参数的位置相互独立
+
+    返回值:
+      * ``AsyncContextManager[List[MessageRecord]]``: 新的消息记录列表
+    """
+    target_key = _target_key(target, kwargs)
+    async with get_session() as db_session:
+        watermark = (
+            await db_session.execute(
+                select(ConsumerWatermark.time, ConsumerWatermark.record_id).where(
+                    ConsumerWatermark.consumer == consumer,
+                    ConsumerWatermark.target == target_key,
+                )
+            )
+        ).first()
+
+    timer = QueryTimer("get_new_messages", target, kwargs, limit=limit)
+    statement = await build_statement(select(MessageRecord), target, **kwargs)
+    statement = paginate_statement(
+        statement,
+        limit=limit,
+        order="asc",
+        cursor=encode_cursor(*watermark) if watermark else None,
+    )
+    records = await execute_statement(timer, statement, scalars=True)
+    timer.finish(len(records), (record.message for record in records))
+
+    yield records
+
+    if records:
+        await _advance_watermark(consumer, target_key, records[-1])
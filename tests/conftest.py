@@ -1,7 +1,14 @@
+from collections.abc import Sequence
+from datetime import datetime, timezone
 from pathlib import Path
 
 import nonebot
 import pytest
+from nonebot import get_driver
+from nonebot.adapters.onebot.v11 import Adapter, Bot, Message
+from nonebot.adapters.onebot.v12 import Adapter as AdapterV12
+from nonebot.adapters.onebot.v12 import Bot as BotV12
+from nonebot.adapters.onebot.v12 import Message as MessageV12
 from nonebug import NONEBOT_INIT_KWARGS, NONEBOT_START_LIFESPAN, App
 from pytest_mock import MockerFixture
 from sqlalchemy import StaticPool, delete
@@ -29,6 +36,12 @@ async def app(app: App, tmp_path: Path, mocker: MockerFixture):
     from nonebot_plugin_orm import get_session, init_orm
     from nonebot_plugin_uninfo.orm import SessionModel
 
+    from nonebot_plugin_cesaa.hook import _session_info_cache
+    from nonebot_plugin_cesaa.model import ConsumerWatermark, MessageRollup
+    from nonebot_plugin_cesaa.query_cache import query_cache
+    from nonebot_plugin_cesaa.recent import recent_buffer
+    from nonebot_plugin_cesaa.target import clear_target_cache
+
     mocker.patch("nonebot_plugin_orm._data_dir", tmp_path / "orm")
 
     await init_orm()
@@ -39,3 +52,162 @@ async def app(app: App, tmp_path: Path, mocker: MockerFixture):
     async with get_session() as session, session.begin():
         await session.execute(delete(MessageRecord))
         await session.execute(delete(SessionModel))
+        await session.execute(delete(ConsumerWatermark))
+        await session.execute(delete(MessageRollup))
+    clear_target_cache()
+    _session_info_cache.clear()
+    recent_buffer.clear()
+    query_cache.clear()
+
+
+@pytest.fixture
+async def _message_record(app: App):
+    from nonebot_plugin_chatrecorder import serialize_message
+    from nonebot_plugin_chatrecorder.model import MessageRecord
+    from nonebot_plugin_orm import get_session
+    from nonebot_plugin_uninfo import (
+        Scene,
+        SceneType,
+        Session,
+        SupportAdapter,
+        SupportScope,
+        User,
+    )
+    from nonebot_plugin_uninfo.orm import get_session_persist_id
+
+    async with app.test_api() as ctx:
+        adapter = Adapter(get_driver())
+        adapter_v12 = AdapterV12(get_driver())
+        bot = ctx.create_bot(base=Bot, adapter=adapter, auto_connect=False)
+        bot_v12 = ctx.create_bot(
+            base=BotV12,
+            adapter=adapter_v12,
+            auto_connect=False,
+            platform="test",
+            impl="test",
+        )
+
+    sessions = [
+        Session(
+            self_id="test",
+            adapter=SupportAdapter.onebot11,
+            scope=SupportScope.qq_client,
+            scene=Scene("10000", SceneType.GROUP),
+            user=User("bot"),
+        ),
+        Session(
+            self_id="test",
+            adapter=SupportAdapter.onebot11,
+            scope=SupportScope.qq_client,
+            scene=Scene("10000", SceneType.GROUP),
+            user=User("10"),
+        ),
+        Session(
+            self_id="test",
+            adapter=SupportAdapter.onebot12,
+            scope=SupportScope.qq_guild,
+            scene=Scene(
+                "100000", SceneType.CHANNEL_TEXT, parent=Scene("10000", SceneType.GUILD)
+            ),
+            user=User("bot"),
+        ),
+        Session(
+            self_id="test",
+            adapter=SupportAdapter.onebot12,
+            scope=SupportScope.qq_guild,
+            scene=Scene(
+                "100000", SceneType.CHANNEL_TEXT, parent=Scene("10000", SceneType.GUILD)
+            ),
+            user=User("10"),
+        ),
+    ]
+    session_ids: list[int] = []
+    async with get_session() as db_session:
+        for session in sessions:
+            session_id = await get_session_persist_id(session)
+            session_ids.append(session_id)
+
+    records = [
+        MessageRecord(
+            session_persist_id=session_ids[0],
+            time=datetime(2022, 1, 2, 4, 0, 0, tzinfo=timezone.utc),
+            type="message_sent",
+            message_id="1",
+            message=serialize_message(bot, Message("qq-10000-bot")),
+            plain_text="qq-10000-bot",
+        ),
+        MessageRecord(
+            session_persist_id=session_ids[1],
+            time=datetime(2022, 1, 2, 4, 0, 0, tzinfo=timezone.utc),
+            type="message",
+            message_id="2",
+            message=serialize_message(bot, Message("qq-10000-10")),
+            plain_text="qq-10000-10",
+        ),
+        MessageRecord(
+            session_persist_id=session_ids[2],
+            time=datetime(2022, 1, 2, 4, 0, 0, tzinfo=timezone.utc),
+            type="message_sent",
+            message_id="3",
+            message=serialize_message(bot, Message("qqguild-100000-10000-bot")),
+            plain_text="qqguild-100000-10000-bot",
+        ),
+        MessageRecord(
+            session_persist_id=session_ids[3],
+            time=datetime(2022, 1, 2, 4, 0, 0, tzinfo=timezone.utc),
+            type="message",
+            message_id="4",
+            message=serialize_message(bot_v12, MessageV12("qqguild-100000-10000-10")),
+            plain_text="qqguild-100000-10000-10",
+        ),
+    ]
+    async with get_session() as db_session:
+        db_session.add_all(records)
+        await db_session.commit()
+
+
+async def add_records(
+    texts: Sequence[str],
+    times: Sequence[datetime],
+    *,
+    group_id: str = "10000",
+    user_id: str = "10",
+) -> int:
+    """向 QQ 群中写入一个用户的消息记录，消息 id 为序号，返回会话持久化 id"""
+    from nonebot_plugin_chatrecorder import serialize_message
+    from nonebot_plugin_chatrecorder.model import MessageRecord
+    from nonebot_plugin_orm import get_session
+    from nonebot_plugin_uninfo import (
+        Scene,
+        SceneType,
+        Session,
+        SupportAdapter,
+        SupportScope,
+        User,
+    )
+    from nonebot_plugin_uninfo.orm import get_session_persist_id
+
+    assert len(texts) == len(times)
+    session_persist_id = await get_session_persist_id(
+        Session(
+            self_id="test",
+            adapter=SupportAdapter.onebot11,
+            scope=SupportScope.qq_client,
+            scene=Scene(group_id, SceneType.GROUP),
+            user=User(user_id),
+        )
+    )
+    async with get_session() as db_session:
+        for i, (text, time) in enumerate(zip(texts, times)):
+            db_session.add(
+                MessageRecord(
+                    session_persist_id=session_persist_id,
+                    time=time,
+                    type="message",
+                    message_id=f"{i}",
+                    message=serialize_message("OneBot V11", Message(text)),
+                    plain_text=text,
+                )
+            )
+        await db_session.commit()
+    return session_persist_id
@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+
+import pytest
+from nonebug import App
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_count_messages(app: App):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import count_messages, count_messages_by_user
+
+    target = TargetQQGroup(group_id=10000)
+
+    assert await count_messages() == 4
+    assert await count_messages(target=target) == 2
+    assert await count_messages(target=target, types=["message"]) == 1
+    assert await count_messages(target=TargetQQGroup(group_id=1)) == 0
+
+    assert await count_messages_by_user() == [("10", 2), ("bot", 2)]
+    assert await count_messages_by_user(target=target, user_ids=["10"]) == [("10", 1)]
+    assert await count_messages_by_user(limit=1) == [("10", 2)]
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_message_histogram(app: App):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import message_histogram
+
+    target = TargetQQGroup(group_id=10000)
+
+    assert await message_histogram(target=target) == [
+        (datetime(2022, 1, 2, 4, tzinfo=timezone.utc), 2)
+    ]
+    assert await message_histogram(bucket="day") == [
+        (datetime(2022, 1, 2, tzinfo=timezone.utc), 4)
+    ]
+
+    with pytest.raises(ValueError, match="不支持的时间精度"):
+        await message_histogram(bucket="week")  # type: ignore
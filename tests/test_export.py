@@ -0,0 +1,63 @@
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+from nonebug import App
+
+
+def _read_chunks(directory: Path, manifest: dict) -> list[dict]:
+    records = []
+    for chunk in manifest["chunks"]:
+        with gzip.open(directory / chunk["file"], "rt", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_export_messages(app: App, tmp_path: Path):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import export_messages
+
+    target = TargetQQGroup(group_id=10000)
+
+    manifest = await export_messages(tmp_path / "all", chunk_size=1)
+    assert manifest["completed"]
+    assert manifest["records"] == 4
+    assert [chunk["records"] for chunk in manifest["chunks"]] == [1, 1, 1, 1]
+    records = _read_chunks(tmp_path / "all", manifest)
+    assert [record["message_id"] for record in records] == ["1", "2", "3", "4"]
+    assert records[0]["scene_id"] == "10000"
+    assert records[0]["message"] == [{"type": "text", "data": {"text": "qq-10000-bot"}}]
+
+    manifest = await export_messages(tmp_path / "group", target=target)
+    assert len(manifest["chunks"]) == 1
+    assert manifest["target"] == {"platform_type": "QQ Group", "group_id": 10000}
+    records = _read_chunks(tmp_path / "group", manifest)
+    assert [record["message_id"] for record in records] == ["1", "2"]
+
+    with pytest.raises(ValueError, match="参数不同"):
+        await export_messages(tmp_path / "group", types=["message"])
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_export_messages_resume(app: App, tmp_path: Path):
+    from nonebot_plugin_cesaa import export_messages
+    from nonebot_plugin_cesaa.export import MANIFEST_NAME
+
+    manifest = await export_messages(tmp_path, chunk_size=1)
+
+    # 模拟写完前两个文件后中断
+    manifest["chunks"] = manifest["chunks"][:2]
+    manifest["records"] = 2
+    manifest["checkpoint"] = manifest["chunks"][-1]["last"]
+    manifest["completed"] = False
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest), "utf-8")
+    (tmp_path / "messages-000002.jsonl.gz").unlink()
+
+    manifest = await export_messages(tmp_path, chunk_size=1)
+    assert manifest["completed"]
+    assert manifest["records"] == 4
+    records = _read_chunks(tmp_path, manifest)
+    assert [record["message_id"] for record in records] == ["1", "2", "3", "4"]
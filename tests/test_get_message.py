@@ -1,118 +1,8 @@
-from datetime import datetime, timezone
-
 import pytest
-from nonebot import get_driver
-from nonebot.adapters.onebot.v11 import Adapter, Bot, Message
-from nonebot.adapters.onebot.v12 import Adapter as AdapterV12
-from nonebot.adapters.onebot.v12 import Bot as BotV12
+from nonebot.adapters.onebot.v11 import Message
 from nonebot.adapters.onebot.v12 import Message as MessageV12
 from nonebug import App
-
-
-@pytest.fixture
-async def _message_record(app: App):
-    from nonebot_plugin_chatrecorder import serialize_message
-    from nonebot_plugin_chatrecorder.model import MessageRecord
-    from nonebot_plugin_orm import get_session
-    from nonebot_plugin_uninfo import (
-        Scene,
-        SceneType,
-        Session,
-        SupportAdapter,
-        SupportScope,
-        User,
-    )
-    from nonebot_plugin_uninfo.orm import get_session_persist_id
-
-    async with app.test_api() as ctx:
-        adapter = Adapter(get_driver())
-        adapter_v12 = AdapterV12(get_driver())
-        bot = ctx.create_bot(base=Bot, adapter=adapter, auto_connect=False)
-        bot_v12 = ctx.create_bot(
-            base=BotV12,
-            adapter=adapter_v12,
-            auto_connect=False,
-            platform="test",
-            impl="test",
-        )
-
-    sessions = [
-        Session(
-            self_id="test",
-            adapter=SupportAdapter.onebot11,
-            scope=SupportScope.qq_client,
-            scene=Scene("10000", SceneType.GROUP),
-            user=User("bot"),
-        ),
-        Session(
-            self_id="test",
-            adapter=SupportAdapter.onebot11,
-            scope=SupportScope.qq_client,
-            scene=Scene("10000", SceneType.GROUP),
-            user=User("10"),
-        ),
-        Session(
-            self_id="test",
-            adapter=SupportAdapter.onebot12,
-            scope=SupportScope.qq_guild,
-            scene=Scene(
-                "100000", SceneType.CHANNEL_TEXT, parent=Scene("10000", SceneType.GUILD)
-            ),
-            user=User("bot"),
-        ),
-        Session(
-            self_id="test",
-            adapter=SupportAdapter.onebot12,
-            scope=SupportScope.qq_guild,
-            scene=Scene(
-                "100000", SceneType.CHANNEL_TEXT, parent=Scene("10000", SceneType.GUILD)
-            ),
-            user=User("10"),
-        ),
-    ]
-    session_ids: list[int] = []
-    async with get_session() as db_session:
-        for session in sessions:
-            session_id = await get_session_persist_id(session)
-            session_ids.append(session_id)
-
-    records = [
-        MessageRecord(
-            session_persist_id=session_ids[0],
-            time=datetime(2022, 1, 2, 4, 0, 0, tzinfo=timezone.utc),
-            type="message_sent",
-            message_id="1",
-            message=serialize_message(bot, Message("qq-10000-bot")),
-            plain_text="qq-10000-bot",
-        ),
-        MessageRecord(
-            session_persist_id=session_ids[1],
-            time=datetime(2022, 1, 2, 4, 0, 0, tzinfo=timezone.utc),
-            type="message",
-            message_id="2",
-            message=serialize_message(bot, Message("qq-10000-10")),
-            plain_text="qq-10000-10",
-        ),
-        MessageRecord(
-            session_persist_id=session_ids[2],
-            time=datetime(2022, 1, 2, 4, 0, 0, tzinfo=timezone.utc),
-            type="message_sent",
-            message_id="3",
-            message=serialize_message(bot, Message("qqguild-100000-10000-bot")),
-            plain_text="qqguild-100000-10000-bot",
-        ),
-        MessageRecord(
-            session_persist_id=session_ids[3],
-            time=datetime(2022, 1, 2, 4, 0, 0, tzinfo=timezone.utc),
-            type="message",
-            message_id="4",
-            message=serialize_message(bot_v12, MessageV12("qqguild-100000-10000-10")),
-            plain_text="qqguild-100000-10000-10",
-        ),
-    ]
-    async with get_session() as db_session:
-        db_session.add_all(records)
-        await db_session.commit()
+from pytest_mock import MockerFixture
 
 
 @pytest.mark.usefixtures("_message_record")
@@ -237,3 +127,161 @@ async def test_target_plain_text(app: App):
         user_ids=["11"],
     )
     assert msgs == []
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_stream(app: App):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import (
+        stream_message_records,
+        stream_messages,
+        stream_messages_plain_text,
+    )
+
+    target = TargetQQGroup(group_id=10000)
+
+    msgs = [msg async for msg in stream_messages(target=target, yield_per=1)]
+    assert msgs == [Message("qq-10000-bot"), Message("qq-10000-10")]
+
+    records = [
+        record.plain_text
+        async for record in stream_message_records(target=target, yield_per=1)
+    ]
+    assert records == ["qq-10000-bot", "qq-10000-10"]
+
+    plain_text = [
+        text
+        async for text in stream_messages_plain_text(yield_per=3, types=["message"])
+    ]
+    assert plain_text == ["qq-10000-10", "qqguild-100000-10000-10"]
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_pagination(app: App):
+    from nonebot_plugin_cesaa import (
+        get_message_records_page,
+        get_messages,
+        get_messages_page,
+        get_messages_plain_text,
+        get_messages_plain_text_page,
+    )
+
+    msgs = await get_messages_plain_text(order="desc", limit=2)
+    assert msgs == ["qqguild-100000-10000-10", "qqguild-100000-10000-bot"]
+
+    msgs, cursor = await get_messages_plain_text_page(limit=3)
+    assert msgs == [
+        "qq-10000-bot",
+        "qq-10000-10",
+        "qqguild-100000-10000-bot",
+    ]
+    assert cursor is not None
+    msgs, cursor = await get_messages_plain_text_page(limit=3, cursor=cursor)
+    assert msgs == ["qqguild-100000-10000-10"]
+    assert cursor is None
+
+    # 游标同样可以传给不分页的函数
+    records, cursor = await get_message_records_page(limit=2, order="desc")
+    assert [record.plain_text for record in records] == [
+        "qqguild-100000-10000-10",
+        "qqguild-100000-10000-bot",
+    ]
+    assert await get_messages(order="desc", cursor=cursor) == [
+        Message("qq-10000-10"),
+        Message("qq-10000-bot"),
+    ]
+
+    msgs, cursor = await get_messages_page(limit=1, types=["message"])
+    assert msgs == [Message("qq-10000-10")]
+    msgs, cursor = await get_messages_page(limit=1, types=["message"], cursor=cursor)
+    assert msgs == [MessageV12("qqguild-100000-10000-10")]
+
+    with pytest.raises(ValueError, match="无效的分页游标"):
+        await get_messages_plain_text(cursor="invalid")
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_for_targets(app: App):
+    from nonebot_plugin_saa import TargetQQGroup, TargetQQGuildChannel
+
+    from nonebot_plugin_cesaa import (
+        get_message_records_for_targets,
+        get_messages_for_targets,
+        get_messages_plain_text_for_targets,
+    )
+
+    group = TargetQQGroup(group_id=10000)
+    channel = TargetQQGuildChannel(channel_id=100000)
+    empty = TargetQQGroup(group_id=1)
+
+    # pyright 不认为 PlatformTarget 可哈希，不能直接写字典字面量
+    msgs = await get_messages_plain_text_for_targets([group, channel, empty])
+    assert list(msgs) == [group, channel, empty]
+    assert msgs[group] == ["qq-10000-bot", "qq-10000-10"]
+    assert msgs[channel] == ["qqguild-100000-10000-bot", "qqguild-100000-10000-10"]
+    assert msgs[empty] == []
+
+    msgs = await get_messages_for_targets([group, channel], types=["message"])
+    assert list(msgs) == [group, channel]
+    assert msgs[group] == [Message("qq-10000-10")]
+    assert msgs[channel] == [MessageV12("qqguild-100000-10000-10")]
+
+    records = await get_message_records_for_targets([group], user_ids=["bot"])
+    assert [record.plain_text for record in records[group]] == ["qq-10000-bot"]
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_for_targets_chunked(app: App, mocker: MockerFixture):
+    from nonebot_plugin_saa import TargetQQGroup, TargetQQGuildChannel
+
+    from nonebot_plugin_cesaa import get_messages_plain_text_for_targets
+    from nonebot_plugin_cesaa import record as record_module
+
+    group = TargetQQGroup(group_id=10000)
+    channel = TargetQQGuildChannel(channel_id=100000)
+
+    # 每个发送目标有两个会话，参数上限只够一个发送目标时拆分为两次查询
+    mocker.patch.object(record_module, "max_parameters", return_value=3)
+    mocker.patch.object(record_module, "count_parameters", return_value=1)
+    execute = mocker.spy(record_module, "execute_statement")
+    msgs = await get_messages_plain_text_for_targets([group, channel])
+    assert execute.call_count == 2
+    assert msgs[group] == ["qq-10000-bot", "qq-10000-10"]
+    assert msgs[channel] == ["qqguild-100000-10000-bot", "qqguild-100000-10000-10"]
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_lazy_messages(app: App):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import get_lazy_messages
+
+    msgs = await get_lazy_messages(target=TargetQQGroup(group_id=10000))
+    assert [msg.adapter for msg in msgs] == ["OneBot V11", "OneBot V11"]
+    assert msgs == [Message("qq-10000-bot"), Message("qq-10000-10")]
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_message_rows(app: App):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import get_message_rows
+
+    target = TargetQQGroup(group_id=10000)
+
+    rows = await get_message_rows(target=target, fields=["user_id", "plain_text"])
+    assert [tuple(row) for row in rows] == [
+        ("bot", "qq-10000-bot"),
+        ("10", "qq-10000-10"),
+    ]
+    assert rows[1].user_id == "10"
+
+    # 只查询关联表的字段
+    rows = await get_message_rows(
+        fields=["scene_id", "scope"], limit=1, order="desc", types=["message"]
+    )
+    assert [tuple(row) for row in rows] == [("100000", "QQGuild")]
+
+    with pytest.raises(ValueError, match="不支持的字段"):
+        await get_message_rows(fields=["unknown"])  # type: ignore
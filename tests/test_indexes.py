@@ -0,0 +1,47 @@
+from nonebug import App
+from sqlalchemy import text
+
+
+async def test_check_indexes(app: App):
+    from nonebot_plugin_orm import get_session
+
+    from nonebot_plugin_cesaa import check_indexes
+    from nonebot_plugin_cesaa.model import scene_index
+
+    reports = await check_indexes()
+    assert [report.name for report in reports] == [
+        "ix_cesaa_message_session_time",
+        "ix_cesaa_message_time",
+        "ix_cesaa_scene",
+        "ix_cesaa_session_scene",
+    ]
+    assert all(report.exists and not report.full_scan for report in reports)
+
+    # 删除索引后检查结果为缺失
+    async with get_session() as db_session:
+        await db_session.execute(text("DROP INDEX ix_cesaa_scene"))
+        await db_session.commit()
+    try:
+        report = next(r for r in await check_indexes() if r.name == "ix_cesaa_scene")
+        assert not report.exists
+    finally:
+        async with get_session() as db_session:
+            connection = await db_session.connection()
+            await connection.run_sync(lambda conn: scene_index.create(conn))
+            await db_session.commit()
+
+
+async def test_is_full_scan(app: App):
+    from nonebot_plugin_cesaa.indexes import _is_full_scan
+
+    assert _is_full_scan("sqlite", "t", ["SCAN t"])
+    assert not _is_full_scan("sqlite", "t", ["SCAN t USING INDEX ix_t"])
+    assert not _is_full_scan("sqlite", "t", ["SEARCH t USING INDEX ix_t (a=?)"])
+    assert _is_full_scan(
+        "postgresql", "t", ["Seq Scan on t  (cost=0.00..35.50 rows=10 width=4)"]
+    )
+    assert not _is_full_scan(
+        "postgresql", "t", ["Index Scan using ix_t on t  (cost=0.15..8.17 rows=1)"]
+    )
+    assert _is_full_scan("mysql", "t", ["1 SIMPLE t None ALL None None None"])
+    assert not _is_full_scan("mysql", "t", ["1 SIMPLE t None ref ix_t ix_t 4"])
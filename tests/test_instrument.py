@@ -0,0 +1,72 @@
+import pytest
+from nonebug import App
+from pytest_mock import MockerFixture
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_on_query(app: App, mocker: MockerFixture):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import QueryMetrics, get_messages, on_query
+    from nonebot_plugin_cesaa import instrument as instrument_module
+
+    mocker.patch.object(instrument_module, "_query_callbacks", [])
+    metrics: list[QueryMetrics] = []
+    on_query(metrics.append)
+
+    await get_messages(target=TargetQQGroup(group_id=10000), types=["message"])
+
+    assert len(metrics) == 1
+    assert metrics[0].api == "get_messages"
+    assert metrics[0].target_type == "TargetQQGroup"
+    assert metrics[0].kwargs == {"types": ["message"]}
+    assert metrics[0].rows == 1
+    assert metrics[0].payload_bytes > 0
+    assert metrics[0].sql.startswith("SELECT")
+    assert metrics[0].sql_time > 0
+    assert metrics[0].total_time >= metrics[0].sql_time
+
+    await get_messages(limit=1, order="desc")
+    assert metrics[1].target_type is None
+    assert metrics[1].kwargs == {"limit": 1, "order": "desc"}
+    assert metrics[1].rows == 1
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_slow_query(app: App, mocker: MockerFixture):
+    from nonebot_plugin_cesaa import get_messages_plain_text
+    from nonebot_plugin_cesaa import instrument as instrument_module
+    from nonebot_plugin_cesaa.config import plugin_config
+
+    logger = mocker.patch.object(instrument_module, "logger")
+
+    await get_messages_plain_text()
+    logger.warning.assert_not_called()
+
+    # 未达到阈值且没有回调时，不统计消息内容也不编译 SQL 语句
+    mocker.patch.object(instrument_module, "_query_callbacks", [])
+    mocker.patch.object(plugin_config, "cesaa_slow_query_threshold", 3600)
+    payload_size = mocker.patch.object(instrument_module, "_payload_size")
+    compile_statement = mocker.spy(instrument_module.Select, "compile")
+    await get_messages_plain_text()
+    logger.warning.assert_not_called()
+    payload_size.assert_not_called()
+    compile_statement.assert_not_called()
+
+    mocker.patch.object(plugin_config, "cesaa_slow_query_threshold", 0)
+    await get_messages_plain_text()
+    logger.warning.assert_called_once()
+    assert "get_messages_plain_text" in logger.warning.call_args[0][0]
+    payload_size.assert_not_called()
+    compile_statement.assert_called_once()
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_explain(app: App):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import explain
+
+    plan = await explain(target=TargetQQGroup(group_id=10000), limit=1)
+    assert plan
+    assert any("nonebot_plugin_chatrecorder_messagerecord_v2" in row for row in plan)
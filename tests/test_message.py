@@ -0,0 +1,64 @@
+from nonebot.adapters.onebot.v11 import Message, MessageSegment
+from nonebug import App
+from pytest_mock import MockerFixture
+
+
+async def test_lazy_message(app: App, mocker: MockerFixture):
+    from nonebot_plugin_chatrecorder import serialize_message
+
+    from nonebot_plugin_cesaa import LazyMessage
+    from nonebot_plugin_cesaa import message as message_module
+
+    deserialize = mocker.spy(message_module, "deserialize_message")
+
+    raw = serialize_message("OneBot V11", Message("+1") + MessageSegment.face(1))
+    lazy = LazyMessage("OneBot V11", raw)
+    assert deserialize.call_count == 0
+
+    assert lazy == Message("+1") + MessageSegment.face(1)
+    assert lazy.extract_plain_text() == "+1"
+    assert len(lazy) == 2
+    assert [seg.type for seg in lazy] == ["text", "face"]
+    assert deserialize.call_count == 1
+
+    # 内容相同的消息只反序列化一次
+    other = LazyMessage("OneBot V11", [dict(seg) for seg in raw])
+    assert other == lazy
+    assert other.message is lazy.message
+    assert deserialize.call_count == 1
+
+    assert lazy[0] == MessageSegment.text("+1")
+    assert lazy["face"] == Message(MessageSegment.face(1))
+    assert "face" in lazy
+    assert MessageSegment.text("+1") in lazy
+    assert lazy + "2" == Message("+1") + MessageSegment.face(1) + "2"
+    assert "2" + lazy == "2" + Message("+1") + MessageSegment.face(1)
+
+    # 修改时复制一份，不影响共享同一个反序列化结果的消息
+    lazy.append("2")
+    assert lazy.extract_plain_text() == "+12"
+    assert other.extract_plain_text() == "+1"
+    assert other.message is not lazy.message
+
+
+async def test_deserialize_messages(app: App, mocker: MockerFixture):
+    from nonebot_plugin_chatrecorder import serialize_message
+
+    from nonebot_plugin_cesaa import message as message_module
+    from nonebot_plugin_cesaa.config import plugin_config
+
+    messages = [Message(f"{i}") for i in range(5)]
+    items = [("OneBot V11", serialize_message("OneBot V11", m)) for m in messages]
+
+    mocker.patch.object(plugin_config, "cesaa_deserialize_chunk_size", 2)
+    chunk = mocker.spy(message_module, "_deserialize_chunk")
+    assert await message_module.deserialize_messages(items) == messages
+    assert chunk.call_count == 3
+
+    # 使用线程池反序列化
+    mocker.patch.object(plugin_config, "cesaa_deserialize_workers", 2)
+    mocker.patch.object(message_module, "_executor", None)
+    assert await message_module.deserialize_messages(items) == messages
+    assert chunk.call_count == 6
+    assert message_module._executor is not None
+    message_module._executor.shutdown()
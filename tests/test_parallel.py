@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+
+import pytest
+from nonebug import App
+from pytest_mock import MockerFixture
+
+from .conftest import add_records
+
+
+async def _add_hourly_records(count: int):
+    await add_records(
+        [f"{i}" for i in range(count)],
+        [datetime(2022, 1, 1, i, tzinfo=timezone.utc) for i in range(count)],
+    )
+
+
+async def test_get_message_records_parallel(app: App, mocker: MockerFixture):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import (
+        get_message_records_parallel,
+        stream_message_records_parallel,
+    )
+    from nonebot_plugin_cesaa import parallel as parallel_module
+    from nonebot_plugin_cesaa.config import plugin_config
+
+    def ids(records):
+        return [record.message_id for record in records]
+
+    assert await get_message_records_parallel() == []
+
+    await _add_hourly_records(10)
+    expected = [f"{i}" for i in range(10)]
+
+    assert ids(await get_message_records_parallel(partitions=3)) == expected
+    assert ids(await get_message_records_parallel(partitions=3, order="desc")) == list(
+        reversed(expected)
+    )
+    assert (
+        ids(
+            await get_message_records_parallel(
+                target=TargetQQGroup(group_id=10000), partitions=4
+            )
+        )
+        == expected
+    )
+
+    # 指定分区数与完整的时间范围时，时间窗口边界上的消息不会重复或遗漏
+    records = await get_message_records_parallel(
+        partitions=3,
+        time_start=datetime(2022, 1, 1, 0, 0, 0, tzinfo=timezone.utc),
+        time_stop=datetime(2022, 1, 1, 6, 0, 0, tzinfo=timezone.utc),
+    )
+    assert ids(records) == expected[:7]
+
+    # 根据消息数量计算分区数
+    mocker.patch.object(plugin_config, "cesaa_parallel_partition_rows", 4)
+    plan = mocker.spy(parallel_module, "_plan_windows")
+    assert (
+        ids([record async for record in stream_message_records_parallel()]) == expected
+    )
+    assert len(plan.spy_return) == 3
+
+    with pytest.raises(ValueError, match="分区数"):
+        await get_message_records_parallel(partitions=0)
+
+
+async def test_stream_message_records_parallel_lazy(app: App, mocker: MockerFixture):
+    import asyncio
+
+    from nonebot_plugin_cesaa import parallel as parallel_module
+    from nonebot_plugin_cesaa import stream_message_records_parallel
+    from nonebot_plugin_cesaa.config import plugin_config
+
+    await _add_hourly_records(10)
+    mocker.patch.object(plugin_config, "cesaa_parallel_max_partitions", 2)
+    execute = mocker.spy(parallel_module, "execute_statement")
+
+    # 消费者未取走的时间窗口不超过上限，取走一个后才查询下一个
+    stream = stream_message_records_parallel(partitions=5)
+    assert (await stream.__anext__()).message_id == "0"
+    await asyncio.sleep(0.1)
+    assert execute.call_count == 3
+
+    ids = [record.message_id async for record in stream]
+    assert ids == [f"{i}" for i in range(1, 10)]
+    assert execute.call_count == 5
@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+
+import pytest
+from nonebug import App
+from pytest_mock import MockerFixture
+
+from .conftest import add_records
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_query_cache(app: App, mocker: MockerFixture):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import get_messages_plain_text
+    from nonebot_plugin_cesaa import instrument as instrument_module
+    from nonebot_plugin_cesaa.config import plugin_config
+
+    mocker.patch.object(plugin_config, "cesaa_result_cache", True)
+    get_session = mocker.spy(instrument_module, "get_session")
+
+    target = TargetQQGroup(group_id=10000)
+    time_stop = datetime(2022, 1, 3, tzinfo=timezone.utc)
+
+    msgs = await get_messages_plain_text(target=target, types=["message"])
+    assert msgs == ["qq-10000-10"]
+    msgs.append("mutated")
+    msgs = await get_messages_plain_text(target=target, types=["message"])
+    assert msgs == ["qq-10000-10"]
+    msgs = await get_messages_plain_text(target=target, time_stop=time_stop)
+    assert msgs == ["qq-10000-bot", "qq-10000-10"]
+    assert get_session.call_count == 2
+
+    # 其他事件场景的新消息不影响缓存
+    await add_records(
+        ["new"], [datetime(2022, 1, 2, 5, tzinfo=timezone.utc)], group_id="10001"
+    )
+    msgs = await get_messages_plain_text(target=target, types=["message"])
+    assert msgs == ["qq-10000-10"]
+    assert get_session.call_count == 2
+
+    # 结束时间之后的新消息不影响缓存
+    await add_records(
+        ["new"], [datetime(2022, 1, 4, tzinfo=timezone.utc)], group_id="10000"
+    )
+    msgs = await get_messages_plain_text(target=target, time_stop=time_stop)
+    assert msgs == ["qq-10000-bot", "qq-10000-10"]
+    assert get_session.call_count == 2
+    msgs = await get_messages_plain_text(target=target, types=["message"])
+    assert msgs == ["qq-10000-10", "new"]
+    assert get_session.call_count == 3
+
+    # 结束时间之前的新消息使缓存失效
+    await add_records(
+        ["new"], [datetime(2022, 1, 2, 5, tzinfo=timezone.utc)], group_id="10000"
+    )
+    msgs = await get_messages_plain_text(target=target, time_stop=time_stop)
+    assert msgs == ["qq-10000-bot", "qq-10000-10", "new"]
+    assert get_session.call_count == 4
+
+    # 时间与结束时间相同的新消息也在查询范围内
+    await add_records(["new"], [time_stop], group_id="10000")
+    msgs = await get_messages_plain_text(target=target, time_stop=time_stop)
+    assert msgs == ["qq-10000-bot", "qq-10000-10", "new", "new"]
+    assert get_session.call_count == 5
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_coalesce(app: App, mocker: MockerFixture):
+    import asyncio
+
+    from nonebot.adapters.onebot.v11 import Message
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import get_messages
+    from nonebot_plugin_cesaa import instrument as instrument_module
+
+    get_session = mocker.spy(instrument_module, "get_session")
+    target = TargetQQGroup(group_id=10000)
+
+    results = await asyncio.gather(
+        *[get_messages(target=target, coalesce=True) for _ in range(3)]
+    )
+    assert get_session.call_count == 1
+    assert results[0] == [Message("qq-10000-bot"), Message("qq-10000-10")]
+    assert results[0] == results[1] == results[2]
+    # 每个调用者得到各自的列表
+    assert results[0] is not results[1]
+
+    # 未开启时各自查询
+    await asyncio.gather(*[get_messages(target=target) for _ in range(3)])
+    assert get_session.call_count == 4
@@ -0,0 +1,79 @@
+import pytest
+from nonebot.adapters.onebot.v11 import Message
+from nonebug import App
+from pytest_mock import MockerFixture
+
+
+@pytest.fixture
+def _recent_cache(app: App, mocker: MockerFixture):
+    from nonebot_plugin_cesaa.config import plugin_config
+
+    mocker.patch.object(plugin_config, "cesaa_recent_cache", True)
+
+
+@pytest.mark.usefixtures("_recent_cache", "_message_record")
+async def test_recent_cache(app: App, mocker: MockerFixture):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import (
+        get_lazy_messages,
+        get_message_records,
+        get_messages,
+        get_messages_plain_text,
+    )
+    from nonebot_plugin_cesaa import instrument as instrument_module
+
+    target = TargetQQGroup(group_id=10000)
+
+    get_session = mocker.spy(instrument_module, "get_session")
+
+    msgs = await get_messages(target=target, limit=2, order="desc")
+    assert msgs == [Message("qq-10000-10"), Message("qq-10000-bot")]
+    msgs = await get_lazy_messages(target=target, limit=1, order="desc")
+    assert msgs == [Message("qq-10000-10")]
+    msgs = await get_messages_plain_text(target=target, limit=2, order="desc")
+    assert msgs == ["qq-10000-10", "qq-10000-bot"]
+    records = await get_message_records(target=target, limit=1, order="desc")
+    assert [record.message_id for record in records] == ["2"]
+    get_session.assert_not_called()
+
+    # 超出缓冲区中的记录数量或者带有其他筛选条件时查询数据库
+    msgs = await get_messages_plain_text(target=target, limit=3, order="desc")
+    assert msgs == ["qq-10000-10", "qq-10000-bot"]
+    msgs = await get_messages_plain_text(
+        target=target, limit=2, order="desc", types=["message"]
+    )
+    assert msgs == ["qq-10000-10"]
+    msgs = await get_messages_plain_text(target=target, limit=2)
+    assert msgs == ["qq-10000-bot", "qq-10000-10"]
+    assert get_session.call_count == 3
+
+
+async def test_recent_buffer_eviction(app: App):
+    from nonebot_plugin_chatrecorder import MessageRecord
+
+    from nonebot_plugin_cesaa.hook import PersistedRecord
+    from nonebot_plugin_cesaa.recent import RecentBuffer
+
+    buffer = RecentBuffer(depth=2, max_records=3)
+
+    def record(scene_id: str, id: int) -> PersistedRecord:
+        return PersistedRecord(
+            MessageRecord(id=id), "OneBot V11", ("QQClient", scene_id, 1), "10"
+        )
+
+    buffer.append(record("1", 1))
+    buffer.append(record("1", 2))
+    buffer.append(record("1", 3))
+    assert len(buffer) == 2
+    buffer.append(record("2", 4))
+    assert len(buffer) == 3
+
+    # 总数超出上限时淘汰最久未活跃的事件场景
+    buffer.append(record("3", 5))
+    assert len(buffer) == 2
+    assert buffer.get(("QQClient", "1", 1), 1) is None
+    assert buffer.get(("QQClient", "2", 1), 2) is None
+    recent = buffer.get(("QQClient", "3", 1), 1)
+    assert recent
+    assert [item.record.id for item in recent] == [5]
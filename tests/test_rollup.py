@@ -0,0 +1,110 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from nonebug import App
+from pytest_mock import MockerFixture
+
+from .conftest import add_records
+
+
+async def _add_hourly_records(user_id: str, hours: range, text: str = ""):
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    await add_records(
+        [text or f"{i}" for i in hours],
+        [start + timedelta(hours=i) for i in hours],
+        user_id=user_id,
+    )
+
+
+async def _check_counts():
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import DailyMessageCount, get_daily_message_counts
+
+    target = TargetQQGroup(group_id=10000)
+
+    # 第一天 0-23 点共 24 条，字符数 10 + 14 * 2；第二天 24-29 点共 6 条
+    assert await get_daily_message_counts(target=target) == [
+        DailyMessageCount(date(2022, 1, 1), None, 24 + 2, 38 + 2),
+        DailyMessageCount(date(2022, 1, 2), None, 6, 12),
+    ]
+    assert await get_daily_message_counts(
+        target=target, day_start=date(2022, 1, 2)
+    ) == [DailyMessageCount(date(2022, 1, 2), None, 6, 12)]
+    assert await get_daily_message_counts(by_user=True, user_ids=["11"]) == [
+        DailyMessageCount(date(2022, 1, 1), "11", 2, 2),
+    ]
+    assert await get_daily_message_counts(target=TargetQQGroup(group_id=1)) == []
+
+
+async def test_rollup_incremental(app: App, mocker: MockerFixture):
+    from sqlalchemy.orm import Session
+
+    from nonebot_plugin_cesaa.config import plugin_config
+    from nonebot_plugin_cesaa.model import MessageRollup
+
+    mocker.patch.object(plugin_config, "cesaa_rollup", True)
+    connection = mocker.spy(Session, "connection")
+
+    await _add_hourly_records("10", range(12))
+    # 使用每日消息统计表所在数据库的连接
+    connection.assert_any_call(mocker.ANY, bind_arguments={"mapper": MessageRollup})
+    # 第二次写入时更新已有的统计
+    await _add_hourly_records("10", range(12, 30))
+    await _add_hourly_records("11", range(8, 10))
+
+    await _check_counts()
+
+
+async def test_backfill_rollup(app: App):
+    from nonebot_plugin_cesaa import backfill_rollup, get_daily_message_counts
+
+    await _add_hourly_records("10", range(30))
+    await _add_hourly_records("11", range(8, 10))
+    assert await get_daily_message_counts() == []
+
+    assert await backfill_rollup(batch_days=1) == 3
+    await _check_counts()
+
+    # 重复执行不会重复统计
+    assert await backfill_rollup(day_start=date(2022, 1, 2)) == 1
+    await _check_counts()
+
+    with pytest.raises(ValueError, match="每批处理的天数必须大于 0"):
+        await backfill_rollup(batch_days=0)
+
+
+async def test_rollup_disabled(app: App, mocker: MockerFixture):
+    from nonebot_plugin_cesaa import get_daily_message_counts
+    from nonebot_plugin_cesaa import hook as hook_module
+
+    # 未开启任何功能时，写入消息记录不会查询会话信息或创建保存点
+    collect = mocker.spy(hook_module, "_collect_records")
+    await _add_hourly_records("10", range(2))
+    collect.assert_not_called()
+    assert await get_daily_message_counts() == []
+
+
+async def test_rollup_non_ascii(app: App, mocker: MockerFixture):
+    from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+    from nonebot_plugin_cesaa import backfill_rollup, get_daily_message_counts
+    from nonebot_plugin_cesaa.config import plugin_config
+    from nonebot_plugin_cesaa.rollup import DailyMessageCount, _text_length
+
+    mocker.patch.object(plugin_config, "cesaa_rollup", True)
+    await _add_hourly_records("10", range(2), "你好，世界")
+    expected = [DailyMessageCount(date(2022, 1, 1), None, 2, 10)]
+    assert await get_daily_message_counts() == expected
+
+    # 补充统计按字符计算，与写入时的结果一致
+    await backfill_rollup()
+    assert await get_daily_message_counts() == expected
+
+    for name, dialect in [
+        ("sqlite", sqlite.dialect()),
+        ("mysql", mysql.dialect()),
+        ("postgresql", postgresql.dialect()),
+    ]:
+        sql = str(_text_length(name).compile(dialect=dialect)).lower()
+        assert sql.startswith("length(" if name == "sqlite" else "char_length(")
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from nonebug import App
+from pytest_mock import MockerFixture
+
+from .conftest import add_records
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_sample_messages(app: App):
+    from nonebot.adapters.onebot.v11 import Message
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import (
+        get_messages_plain_text,
+        sample_message_records,
+        sample_messages,
+        sample_messages_plain_text,
+    )
+
+    all_texts = await get_messages_plain_text()
+    for _ in range(5):
+        texts = await sample_messages_plain_text(n=2)
+        assert len(texts) == 2
+        assert len(set(texts)) == 2
+        assert set(texts) <= set(all_texts)
+
+    # 符合条件的消息记录不足时返回全部
+    target = TargetQQGroup(group_id=10000)
+    assert await sample_messages_plain_text(target=target, n=10) == [
+        "qq-10000-bot",
+        "qq-10000-10",
+    ]
+    assert await sample_messages(target=target, n=10) == [
+        Message("qq-10000-bot"),
+        Message("qq-10000-10"),
+    ]
+    records = await sample_message_records(n=10, types=["message"])
+    assert [record.message_id for record in records] == ["2", "4"]
+
+    assert await sample_message_records(n=0) == []
+    assert await sample_message_records(target=TargetQQGroup(group_id=1), n=5) == []
+    with pytest.raises(ValueError, match="抽样数量"):
+        await sample_message_records(n=-1)
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_sample_chunked(app: App, mocker: MockerFixture):
+    from nonebot_plugin_cesaa import get_messages_plain_text, sample_messages_plain_text
+    from nonebot_plugin_cesaa import sample as sample_module
+
+    # 抽到的消息记录超过参数上限时分批获取，合并后仍然按时间排序
+    mocker.patch.object(sample_module, "max_parameters", return_value=3)
+    execute = mocker.spy(sample_module, "execute_statement")
+    assert await sample_messages_plain_text(n=4) == await get_messages_plain_text()
+    assert execute.call_count == 2
+
+
+async def test_sample_many_sessions(app: App, mocker: MockerFixture):
+    from nonebot_plugin_chatrecorder import MessageRecord
+    from nonebot_plugin_orm import get_session
+    from nonebot_plugin_saa import TargetQQGroup
+    from sqlalchemy import event
+
+    from nonebot_plugin_cesaa import sample as sample_module
+    from nonebot_plugin_cesaa import sample_message_records
+
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    for i in range(40):
+        await add_records([f"{i}"], [start + timedelta(minutes=i)], user_id=f"{i}")
+    async with get_session() as db_session:
+        engine = db_session.get_bind(MessageRecord)
+
+    # 每次探测都包含 40 个会话 id，探测数量需要随参数上限减少
+    mocker.patch.object(sample_module, "max_parameters", return_value=200)
+    parameters: list[int] = []
+
+    def count_parameters(conn, cursor, statement, params, context, executemany):
+        parameters.append(len(params))
+
+    event.listen(engine, "before_cursor_execute", count_parameters)
+    try:
+        records = await sample_message_records(
+            target=TargetQQGroup(group_id=10000), n=10
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", count_parameters)
+
+    assert len({record.id for record in records}) == 10
+    assert max(parameters) <= 200
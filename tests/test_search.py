@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+
+import pytest
+from nonebug import App
+
+from .conftest import add_records
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_search_messages(app: App):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import build_search_index, search_messages
+
+    target = TargetQQGroup(group_id=10000)
+
+    async def search(query: str, **kwargs) -> list[str]:
+        records = await search_messages(query=query, **kwargs)
+        return [record.plain_text for record in records]
+
+    # 未创建全文索引时使用 LIKE
+    assert await search("10000-10") == ["qq-10000-10", "qqguild-100000-10000-10"]
+    assert await search("QQ-10000", target=target) == ["qq-10000-bot", "qq-10000-10"]
+    assert await search("%") == []
+
+    assert await build_search_index()
+
+    assert await search("10000-10") == ["qq-10000-10", "qqguild-100000-10000-10"]
+    assert await search("QQ-10000", target=target) == ["qq-10000-bot", "qq-10000-10"]
+    assert await search('"') == []
+
+    # 新消息通过触发器加入索引
+    await add_records(["今天天气不错"], [datetime(2022, 1, 2, 5, tzinfo=timezone.utc)])
+    assert await search("天气不", target=target) == ["今天天气不错"]
+    # 少于三个字符时无法使用索引
+    assert await search("天气") == ["今天天气不错"]
+    assert await search("天气", types=["message_sent"]) == []
+
+    with pytest.raises(ValueError, match="搜索关键词不能为空"):
+        await search("")
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_search_index_created_later(app: App):
+    from nonebot_plugin_orm import get_session
+    from sqlalchemy import text
+
+    from nonebot_plugin_cesaa import search_messages
+
+    assert len(await search_messages(query="10000-10")) == 2
+
+    # 其他进程创建全文索引后不需要重启即可使用，这里的索引为空
+    async with get_session() as db_session:
+        await db_session.execute(
+            text(
+                "CREATE VIRTUAL TABLE nonebot_plugin_cesaa_fts USING fts5("
+                "plain_text, content='nonebot_plugin_chatrecorder_messagerecord_v2', "
+                "content_rowid='id', tokenize='trigram')"
+            )
+        )
+        await db_session.commit()
+    assert await search_messages(query="10000-10") == []
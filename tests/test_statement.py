@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+from nonebug import App
+
+
+async def test_join_pruning(app: App):
+    from nonebot_plugin_chatrecorder import MessageRecord
+    from nonebot_plugin_uninfo.orm import BotModel
+    from sqlalchemy import select
+
+    from nonebot_plugin_cesaa.statement import build_statement
+
+    # 只用到消息记录表的筛选条件不需要连接其他表
+    statement = await build_statement(
+        select(MessageRecord.plain_text),
+        time_start=datetime(2022, 1, 1, tzinfo=timezone.utc),
+        types=["message"],
+    )
+    assert "JOIN" not in str(statement)
+
+    # 查询列引用的表同样需要连接
+    statement = await build_statement(select(MessageRecord.message, BotModel.adapter))
+    sql = str(statement)
+    assert "JOIN nonebot_plugin_uninfo_sessionmodel" in sql
+    assert "JOIN nonebot_plugin_uninfo_botmodel" in sql
+    assert "scenemodel" not in sql
+    assert "usermodel" not in sql
+
+    statement = await build_statement(select(MessageRecord), user_ids=["10"])
+    sql = str(statement)
+    assert "JOIN nonebot_plugin_uninfo_usermodel" in sql
+    assert "botmodel" not in sql
+    assert "scenemodel" not in sql
@@ -0,0 +1,191 @@
+from datetime import datetime, timezone
+
+import pytest
+from nonebug import App
+from pytest_mock import MockerFixture
+
+from .conftest import add_records
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_resolve_session_persist_ids(app: App):
+    from nonebot_plugin_saa import TargetQQGroup, TargetQQGuildChannel
+
+    from nonebot_plugin_cesaa import get_messages_plain_text
+    from nonebot_plugin_cesaa.target import resolve_session_persist_ids
+
+    target = TargetQQGroup(group_id=10000)
+    assert len(await resolve_session_persist_ids(target)) == 2
+    assert len(await resolve_session_persist_ids(TargetQQGroup(group_id=1))) == 0
+    assert (
+        len(await resolve_session_persist_ids(TargetQQGuildChannel(channel_id=100000)))
+        == 2
+    )
+
+    # 新用户发言后，缓存应失效
+    session_persist_id = await add_records(
+        ["qq-10000-11"], [datetime(2022, 1, 2, 5, tzinfo=timezone.utc)], user_id="11"
+    )
+    assert session_persist_id in await resolve_session_persist_ids(target)
+    assert await get_messages_plain_text(target=target) == [
+        "qq-10000-bot",
+        "qq-10000-10",
+        "qq-10000-11",
+    ]
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_resolve_session_persist_ids_cleared_during_query(
+    app: App, mocker: MockerFixture
+):
+    from contextlib import asynccontextmanager
+
+    from nonebot_plugin_orm import get_session
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa.target import (
+        _session_persist_ids_cache,
+        clear_target_cache,
+        resolve_session_persist_ids,
+        resolve_session_persist_ids_many,
+    )
+
+    @asynccontextmanager
+    async def session_then_clear():
+        async with get_session() as db_session:
+            yield db_session
+        # 模拟查询期间有新会话写入
+        clear_target_cache()
+
+    mocker.patch("nonebot_plugin_cesaa.target.get_session", session_then_clear)
+
+    target = TargetQQGroup(group_id=10000)
+    assert len(await resolve_session_persist_ids(target)) == 2
+    assert _session_persist_ids_cache.get(target) is None
+    assert len((await resolve_session_persist_ids_many([target]))[target]) == 2
+    assert _session_persist_ids_cache.get(target) is None
+
+
+async def test_target_to_scene(app: App):
+    from nonebot_plugin_saa import (
+        TargetOB12Unknow,
+        TargetQQGroup,
+        TargetSatoriUnknown,
+        TargetTelegramForum,
+    )
+    from nonebot_plugin_uninfo import SupportScope
+
+    from nonebot_plugin_cesaa.target import target_to_scene
+
+    assert target_to_scene(TargetQQGroup(group_id=10000)) == ("QQClient", "10000", 1)
+    assert target_to_scene(TargetTelegramForum(chat_id=1, message_thread_id=2)) == (
+        "Telegram",
+        "2",
+        3,
+    )
+    assert target_to_scene(
+        TargetOB12Unknow(platform="test", detail_type="private", user_id="1")
+    ) == (SupportScope.ensure_ob12("test").value, "1", 0)
+    assert target_to_scene(
+        TargetSatoriUnknown(platform="test", channel_id="2", guild_id="3")
+    ) == (SupportScope.ensure_satori("test").value, "2", 3)
+
+
+@pytest.fixture
+def _restore_target_registry(app: App):
+    from nonebot_plugin_cesaa import target as target_module
+
+    registry = dict(target_module._target_registry)
+    builders = dict(target_module._target_builders)
+    yield
+    target_module._target_registry.clear()
+    target_module._target_registry.update(registry)
+    target_module._target_builders.clear()
+    target_module._target_builders.update(builders)
+    target_module._clear_registry_caches()
+
+
+@pytest.mark.usefixtures("_restore_target_registry")
+async def test_register_target(app: App):
+    from nonebot_plugin_saa import TargetQQGroup
+    from nonebot_plugin_uninfo import SceneType, SupportScope
+
+    from nonebot_plugin_cesaa import register_target
+    from nonebot_plugin_cesaa.target import target_to_scene
+
+    class TargetQQGroupCustom(TargetQQGroup):
+        pass
+
+    # 子类默认沿用父类的对应关系
+    target = TargetQQGroupCustom(group_id=10000)
+    assert target_to_scene(target) == ("QQClient", "10000", 1)
+
+    register_target(
+        TargetQQGroupCustom, (SupportScope.qq_api, "group_id", SceneType.GROUP)
+    )
+    assert target_to_scene(target) == ("QQAPI", "10000", 1)
+
+    register_target(
+        TargetQQGroupCustom, lambda target: ("QQAPI", f"custom-{target.group_id}", 1)
+    )
+    assert target_to_scene(target) == ("QQAPI", "custom-10000", 1)
+    assert target_to_scene(TargetQQGroup(group_id=10000)) == ("QQClient", "10000", 1)
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_records_to_targets(app: App, mocker: MockerFixture):
+    from nonebot_plugin_saa import TargetQQGroup, TargetQQGuildChannel
+
+    from nonebot_plugin_cesaa import get_message_records, records_to_targets
+    from nonebot_plugin_cesaa import target as target_module
+
+    # 会话持久化 id 分批查询
+    mocker.patch.object(target_module, "_MAX_PARAMETERS", 3)
+    records = await get_message_records()
+    assert await records_to_targets(records) == [
+        TargetQQGroup(group_id=10000),
+        TargetQQGroup(group_id=10000),
+        TargetQQGuildChannel(channel_id=100000),
+        TargetQQGuildChannel(channel_id=100000),
+    ]
+    assert await records_to_targets([]) == []
+
+
+async def test_scene_to_target(app: App):
+    from nonebot_plugin_saa import (
+        TargetOB12Unknow,
+        TargetQQGroupOpenId,
+        TargetQQGuildDirect,
+        TargetSatoriUnknown,
+        TargetTelegramForum,
+    )
+    from nonebot_plugin_uninfo import SupportAdapter
+
+    from nonebot_plugin_cesaa import SessionScene, scene_to_target
+    from nonebot_plugin_cesaa.target import target_to_scene
+
+    def scene(target, adapter=SupportAdapter.onebot11, parent=None):
+        return SessionScene(adapter, "bot", *target_to_scene(target), parent)  # type: ignore
+
+    for target, adapter, parent in [
+        (TargetQQGroupOpenId(group_openid="group", bot_id="bot"), "QQ", None),
+        (TargetQQGuildDirect(recipient_id=1, source_guild_id=2), "QQ", "2"),
+        (TargetTelegramForum(chat_id=1, message_thread_id=2), "Telegram", "1"),
+        (
+            TargetOB12Unknow(platform="wechat", detail_type="private", user_id="1"),
+            SupportAdapter.onebot12,
+            None,
+        ),
+        (
+            TargetSatoriUnknown(platform="wecom", guild_id="1", channel_id="2"),
+            SupportAdapter.satori,
+            "1",
+        ),
+    ]:
+        assert scene_to_target(scene(target, adapter, parent)) == target
+
+    # 缺少父级事件场景或者平台无法确定时无法转换
+    target = TargetQQGuildDirect(recipient_id=1, source_guild_id=2)
+    assert scene_to_target(scene(target)) is None
+    target = TargetSatoriUnknown(platform="test", channel_id="1")
+    assert scene_to_target(scene(target, SupportAdapter.satori)) is None
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+import pytest
+from nonebug import App
+
+
+@pytest.mark.usefixtures("_message_record")
+async def test_get_new_messages(app: App):
+    from nonebot_plugin_saa import TargetQQGroup
+
+    from nonebot_plugin_cesaa import get_new_messages
+
+    target = TargetQQGroup(group_id=10000)
+
+    async with get_new_messages(consumer="test", limit=3) as records:
+        assert [record.message_id for record in records] == ["1", "2", "3"]
+    async with get_new_messages(consumer="test", limit=3) as records:
+        assert [record.message_id for record in records] == ["4"]
+    async with get_new_messages(consumer="test", limit=3) as records:
+        assert records == []
+
+    # 处理失败时位置不变
+    async def consume():
+        async with get_new_messages(consumer="test", target=target) as records:
+            assert [record.message_id for record in records] == ["1", "2"]
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        await consume()
+    async with get_new_messages(consumer="test", target=target) as records:
+        assert [record.message_id for record in records] == ["1", "2"]
+    async with get_new_messages(consumer="test", target=target) as records:
+        assert records == []
+
+    # 不同消费者的位置相互独立
+    async with get_new_messages(consumer="other", types=["message"]) as records:
+        assert [record.message_id for record in records] == ["2", "4"]
+
+    # 筛选参数不同的位置相互独立，时间范围不影响位置
+    async with get_new_messages(consumer="users", user_ids=["bot"]) as records:
+        assert [record.message_id for record in records] == ["1", "3"]
+    async with get_new_messages(consumer="users", user_ids=["10"]) as records:
+        assert [record.message_id for record in records] == ["2", "4"]
+    async with get_new_messages(
+        consumer="users",
+        user_ids=["bot"],
+        time_stop=datetime(2023, 1, 1, tzinfo=timezone.utc),
+    ) as records:
+        assert records == []